@@ -1,26 +1,52 @@
 """
 Pure Flask Telegram TTS Bot - No Aiogram
-Uses Telegram Bot API directly via requests
+Uses Telegram Bot API directly via a pooled requests session
 """
 import os
+import hmac
 import json
 import logging
-import requests
 import uuid
 import asyncio
 import time
-import random
-from pathlib import Path
-from flask import Flask, request, jsonify, session, render_template, send_from_directory
+import threading
+from flask import Flask, Response, request, jsonify, session, render_template, send_from_directory, send_file, url_for
+from werkzeug.security import safe_join
 from flask_session import Session
 from flask_cors import CORS
 import edge_tts
 from aiohttp.client_exceptions import WSServerHandshakeError
 
-from bot.config import API_TOKEN, OWNER_ID, ABHIBOTS_CHANNEL_ID, BASE_AUDIO_DIR, MAX_TEXT_LENGTH, WEBHOOK_URL
-from bot.utils import load_voice_list, get_countries, get_languages, get_voices, cleanup_audio_files, sanitize_callback_data
-from bot.keyboards import create_country_keyboard, create_language_keyboard, create_voice_keyboard, create_join_keyboard
-from bot.user_manager import register_user, get_all_users, get_user_count, is_owner, load_users
+from bot.config import API_TOKEN, TELEGRAM_API_BASE, EDGE_TTS_WSS_URL, OWNER_ID, ABHIBOTS_CHANNEL_ID, BASE_AUDIO_DIR, MAX_TEXT_LENGTH, WEBHOOK_URL, TTS_WORKERS, TTS_QUEUE_SIZE
+from bot.config import AUDIO_CACHE_DIR, AUDIO_CACHE_MEMORY_BYTES, AUDIO_CACHE_DISK_BYTES, FILE_ID_INDEX_PATH
+from bot.config import AUDIO_EXPIRY_TIME, AUDIO_DISK_QUOTA, AUDIO_REAPER_INTERVAL, AUDIO_REAPER_BATCH
+from bot.config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_CHECKPOINT_PATH
+from bot.config import STATE_BACKEND, STATE_TTL, STATE_DB_PATH, WEBHOOK_RECORD_PATH
+from bot.config import PROFILE_TOKEN, PROFILE_INTERVAL, PROFILE_MAX_SECONDS
+from bot.config import MENU_EDIT_IN_PLACE
+from bot.config import TTS_CHUNK_CHARS, TTS_CHUNK_PARALLELISM, TTS_WEB_DEADLINE, TTS_JOB_DEADLINE
+from bot.config import EDGE_BREAKER_THRESHOLD, EDGE_BREAKER_RECOVERY, EDGE_CONCURRENCY_INITIAL, EDGE_CONCURRENCY_MAX
+from bot.voice_catalog import get_catalog
+from bot.web_assets import WebAsset, IMMUTABLE_CACHE
+from bot import callback_data
+from bot.keyboards import KeyboardCache, create_join_keyboard
+from bot.user_manager import register_user, get_all_users, get_user_count, is_owner, export_user_db, user_store
+from bot.job_queue import JobQueue, QueueFullError
+from bot.telegram_api import TelegramClient
+from bot.broadcast import BroadcastEngine
+from bot.state_store import create_state_store
+from bot.tts import split_text, join_mp3_frames, synthesize_bytes, iter_audio_sync
+from bot.audio_cache import AudioCache, cache_key, CACHE_KEY_RE
+from bot.audio_reaper import AudioReaper
+from bot.file_id_index import FileIdIndex
+from bot.update_recorder import UpdateRecorder
+from bot import tracing
+from bot.profiler import SamplingProfiler, ProfilerBusyError
+from bot.metrics import REGISTRY, WEBHOOK_SECONDS, TTS_ATTEMPT_SECONDS, TTS_RETRIES, TTS_GIVE_UPS, QUEUE_DEPTH
+from bot.async_runtime import AsyncRuntime
+from bot.single_flight import SingleFlight
+from bot.retry_policy import RetryPolicy, GiveUpError
+from bot.edge_guard import EdgeGuard, CircuitBreaker, AimdLimiter, EdgeUnavailableError, EDGE_403_PREFIX, classify_error
 
 # Configure Logging
 logging.basicConfig(
@@ -37,35 +63,90 @@ logger.info(f"Webhook URL: {WEBHOOK_URL}")
 logger.info(f"Owner ID: {OWNER_ID}")
 logger.info("=" * 50)
 
-# Initialize Flask app
-app = Flask(__name__, template_folder='templates', static_folder='static')
+# Initialize Flask app (static files go through serve_static, which also knows the audio dir)
+app = Flask(__name__, template_folder='templates', static_folder=None)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
 app.config['SESSION_TYPE'] = 'filesystem'
 CORS(app)  # Enable CORS for all routes
 Session(app)
 
-# Telegram Bot API base URL
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{API_TOKEN}"
+# Telegram Bot API client (shared keep-alive connection pool)
+telegram = TelegramClient(API_TOKEN, base_url=TELEGRAM_API_BASE)
 
-# User states storage (in-memory, use Redis for production)
-user_states = {}
-user_data = {}
+# Broadcasts run in the background; resume one interrupted by a restart
+broadcast_engine = BroadcastEngine(
+    telegram,
+    BROADCAST_CHECKPOINT_PATH,
+    rate=BROADCAST_RATE,
+    concurrency=BROADCAST_CONCURRENCY,
+    skip_user_id=OWNER_ID
+)
+broadcast_engine.resume()
+
+# Per-user conversation state (menu step, selected catalog indexes, voice)
+state_store = create_state_store(STATE_BACKEND, STATE_TTL, STATE_DB_PATH)
+
+# Background workers for TTS so the webhook can answer Telegram immediately
+tts_queue = JobQueue('tts', workers=TTS_WORKERS, max_size=TTS_QUEUE_SIZE)
+
+# Callback query answers, sent while the webhook thread updates the menu
+callback_answers = JobQueue('callback_answers', workers=2, max_size=200)
+
+QUEUE_DEPTH.set_callback(lambda: {('tts',): tts_queue.depth(), ('callback_answers',): callback_answers.depth()})
+
+# Edge TTS endpoint override (benchmarks run against a local fake server)
+if EDGE_TTS_WSS_URL:
+    edge_tts.communicate.WSS_URL = EDGE_TTS_WSS_URL
+    logger.info(f"Edge TTS endpoint overridden: {EDGE_TTS_WSS_URL}")
+
+# Event loop thread owning Edge TTS connections (shared connector + DNS cache)
+tts_runtime = AsyncRuntime('tts')
+
+# Global back-off when Edge throttles us: circuit breaker + adaptive concurrency
+edge_guard = EdgeGuard(
+    CircuitBreaker(threshold=EDGE_BREAKER_THRESHOLD, recovery_time=EDGE_BREAKER_RECOVERY),
+    AimdLimiter(initial=EDGE_CONCURRENCY_INITIAL, maximum=EDGE_CONCURRENCY_MAX)
+)
+
+# Identical concurrent synthesis requests (batch or /tts/stream) share one Edge session
+tts_flights = SingleFlight()
+
+# Expires and deletes cached audio in background batches within a disk quota
+audio_reaper = AudioReaper(
+    AUDIO_CACHE_DIR, AUDIO_EXPIRY_TIME, AUDIO_DISK_QUOTA,
+    interval=AUDIO_REAPER_INTERVAL, batch_size=AUDIO_REAPER_BATCH,
+    on_delete=lambda path: audio_cache.forget(path.stem)
+)
+
+# Synthesized audio keyed by (voice, normalized text)
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MEMORY_BYTES, AUDIO_CACHE_DISK_BYTES, reaper=audio_reaper)
+
+# Telegram file_ids of uploaded audio, keyed like audio_cache
+file_id_index = FileIdIndex(FILE_ID_INDEX_PATH)
+
+# Serialized menu keyboards shared by all users
+keyboard_cache = KeyboardCache()
+
+# On-demand stack sampling of all threads (owner /profile command, /debug/profile)
+profiler = SamplingProfiler(interval=PROFILE_INTERVAL)
+
+# Optional log of incoming updates for replay (WEBHOOK_RECORD_PATH)
+update_recorder = UpdateRecorder(WEBHOOK_RECORD_PATH) if WEBHOOK_RECORD_PATH else None
 
 
 def send_message(chat_id, text, reply_markup=None, parse_mode='Markdown'):
     """Send message via Telegram Bot API."""
-    url = f"{TELEGRAM_API_URL}/sendMessage"
     payload = {
         'chat_id': chat_id,
         'text': text,
         'parse_mode': parse_mode
     }
     if reply_markup:
-        payload['reply_markup'] = json.dumps(reply_markup)
+        # Cached menus arrive already serialized (KeyboardCache)
+        payload['reply_markup'] = reply_markup if isinstance(reply_markup, str) else json.dumps(reply_markup)
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        return response.json()
+        return telegram.call('sendMessage', payload)
     except Exception as e:
         logger.error(f"Error sending message: {e}")
         return None
@@ -73,8 +154,6 @@ def send_message(chat_id, text, reply_markup=None, parse_mode='Markdown'):
 
 def send_audio(chat_id, audio_path, caption=None):
     """Send audio file via Telegram Bot API."""
-    url = f"{TELEGRAM_API_URL}/sendAudio"
-    
     try:
         with open(audio_path, 'rb') as audio_file:
             files = {'audio': audio_file}
@@ -82,47 +161,94 @@ def send_audio(chat_id, audio_path, caption=None):
             if caption:
                 data['caption'] = caption
             
-            response = requests.post(url, files=files, data=data, timeout=30)
-            return response.json()
+            return telegram.call('sendAudio', data, files=files)
     except Exception as e:
         logger.error(f"Error sending audio: {e}")
         return None
 
 
+def send_audio_by_file_id(chat_id, file_id, caption=None):
+    """Send previously uploaded audio by its Telegram file_id (no upload)."""
+    payload = {
+        'chat_id': chat_id,
+        'audio': file_id
+    }
+    if caption:
+        payload['caption'] = caption
+    
+    try:
+        return telegram.call('sendAudio', payload)
+    except Exception as e:
+        logger.error(f"Error sending audio by file_id: {e}")
+        return None
+
+
+def get_sent_file_id(result):
+    """Extract the file_id of the audio in a sendAudio result, if any."""
+    if not result or not result.get('ok'):
+        return None
+    sent = result.get('result', {})
+    media = sent.get('audio') or sent.get('voice') or sent.get('document') or {}
+    return media.get('file_id')
+
+
 def edit_message_reply_markup(chat_id, message_id, reply_markup=None):
     """Edit message reply markup."""
-    url = f"{TELEGRAM_API_URL}/editMessageReplyMarkup"
     payload = {
         'chat_id': chat_id,
         'message_id': message_id
     }
     if reply_markup:
-        payload['reply_markup'] = json.dumps(reply_markup)
+        # Cached menus arrive already serialized (KeyboardCache)
+        payload['reply_markup'] = reply_markup if isinstance(reply_markup, str) else json.dumps(reply_markup)
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        return response.json()
+        return telegram.call('editMessageReplyMarkup', payload)
     except Exception as e:
         logger.error(f"Error editing message: {e}")
         return None
 
 
+def edit_message_text(chat_id, message_id, text, reply_markup=None, parse_mode='Markdown'):
+    """Replace the text (and keyboard) of a sent message."""
+    payload = {
+        'chat_id': chat_id,
+        'message_id': message_id,
+        'text': text,
+        'parse_mode': parse_mode
+    }
+    if reply_markup:
+        payload['reply_markup'] = reply_markup if isinstance(reply_markup, str) else json.dumps(reply_markup)
+    
+    try:
+        return telegram.call('editMessageText', payload)
+    except Exception as e:
+        logger.error(f"Error editing message text: {e}")
+        return None
+
+
 def answer_callback_query(callback_query_id, text=None):
     """Answer callback query."""
-    url = f"{TELEGRAM_API_URL}/answerCallbackQuery"
     payload = {'callback_query_id': callback_query_id}
     if text:
         payload['text'] = text
     
     try:
-        requests.post(url, json=payload, timeout=5)
+        telegram.call('answerCallbackQuery', payload)
     except Exception as e:
         logger.error(f"Error answering callback: {e}")
 
 
+def answer_callback_query_async(callback_query_id, text=None):
+    """Answer a callback query from a background worker, overlapping the menu update."""
+    try:
+        callback_answers.submit(answer_callback_query, callback_query_id, text)
+    except QueueFullError:
+        answer_callback_query(callback_query_id, text)
+
+
 def forward_message(chat_id, from_chat_id, message_id):
     """Forward message."""
-    url = f"{TELEGRAM_API_URL}/forwardMessage"
     payload = {
         'chat_id': chat_id,
         'from_chat_id': from_chat_id,
@@ -130,8 +256,7 @@ def forward_message(chat_id, from_chat_id, message_id):
     }
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        return response.json()
+        return telegram.call('forwardMessage', payload)
     except Exception as e:
         logger.error(f"Error forwarding message: {e}")
         return None
@@ -139,15 +264,13 @@ def forward_message(chat_id, from_chat_id, message_id):
 
 def get_chat_member(chat_id, user_id):
     """Get chat member status."""
-    url = f"{TELEGRAM_API_URL}/getChatMember"
     payload = {
         'chat_id': chat_id,
         'user_id': user_id
     }
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        result = response.json()
+        result = telegram.call('getChatMember', payload)
         if result.get('ok'):
             return result.get('result', {}).get('status')
         return None
@@ -184,17 +307,15 @@ async def _generate_tts_async(text, voice, output_path, timeout=30):
             text, 
             voice,
             connect_timeout=timeout,
-            receive_timeout=timeout * 2
+            receive_timeout=timeout * 2,
+            connector=tts_runtime.connector()
         )
         
         # Save audio file - this is the critical step
         logger.debug(f"Calling communicate.save() to {output_path}")
-        await communicate.save(str(output_path))
+        await edge_guard.call(lambda: communicate.save(str(output_path)))
         logger.debug(f"communicate.save() completed")
         
-        # Small delay to ensure file system sync (especially on Heroku)
-        await asyncio.sleep(0.5)
-        
         # Verify file was created and has content
         if output_path.exists():
             file_size = output_path.stat().st_size
@@ -209,157 +330,263 @@ async def _generate_tts_async(text, voice, output_path, timeout=30):
             logger.error(f"Generated audio file is missing: {output_path} (file does not exist)")
             raise Exception("No audio was received. Please verify that your parameters are correct.")
             
-    except ValueError as e:
+    except Exception as e:
+        _raise_tts_error(e, text, voice, timeout)
+
+
+def _raise_tts_error(e, text, voice, timeout):
+    """Re-raise a synthesis failure with the message the retry loop classifies on."""
+    if isinstance(e, EdgeUnavailableError):
+        raise e
+    if isinstance(e, ValueError):
         # Invalid voice or parameters
         logger.error(f"Invalid TTS parameters: {e}")
         raise Exception(f"Invalid voice parameter: {voice}. Please select a valid voice.")
-    except WSServerHandshakeError as e:
+    if isinstance(e, WSServerHandshakeError):
         # Check if it's a 403 error (rate limiting/IP blocking)
         error_str = str(e)
         logger.error(f"WSServerHandshakeError: {e}")
         if '403' in error_str or 'Invalid response status' in error_str:
-            raise Exception(f"Edge TTS 403 error: {e}")
+            raise Exception(f"{EDGE_403_PREFIX}: {e}")
         else:
             raise Exception(f"TTS WebSocket error: {e}")
-    except asyncio.TimeoutError as e:
+    if isinstance(e, asyncio.TimeoutError):
         logger.error(f"TTS generation timeout: {e}")
         raise Exception(f"TTS generation timed out after {timeout}s. Please try again.")
-    except Exception as e:
-        # Log the full exception for debugging
-        import traceback
-        logger.error(f"TTS generation error: {type(e).__name__}: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        # Re-raise with better error message if needed
-        error_str = str(e)
-        if 'No audio was received' in error_str or 'empty' in error_str.lower():
-            raise Exception(f"No audio was received. Please verify that your parameters are correct. Voice: {voice}, Text length: {len(text)}")
-        raise
+    
+    # Log the full exception for debugging
+    import traceback
+    logger.error(f"TTS generation error: {type(e).__name__}: {e}")
+    logger.error(f"Traceback: {traceback.format_exc()}")
+    # Re-raise with better error message if needed
+    error_str = str(e)
+    if 'No audio was received' in error_str or 'empty' in error_str.lower():
+        raise Exception(f"No audio was received. Please verify that your parameters are correct. Voice: {voice}, Text length: {len(text)}")
+    raise e
 
 
-def generate_tts_with_retry(text, voice, output_path, max_retries=5, fast_mode=False):
+async def _generate_tts_chunked_async(chunks, voice, output_path, done, timeout=30):
     """
-    Generate TTS audio with retry logic for handling 403 errors.
-    Uses edge_tts library with proper async handling and improved retry strategy.
+    Synthesize the chunks of a long text concurrently and join them into one file.
+    
+    Args:
+        chunks: Text chunks from split_text()
+        voice: Voice shortname
+        output_path: Path to save the joined audio file
+        done: Dict of chunk index -> MP3 bytes, filled in place so that a
+              retry only re-synthesizes the chunks that failed
+        timeout: Connection timeout in seconds per chunk
+    
+    Returns:
+        True if successful (raises otherwise)
+    """
+    semaphore = asyncio.Semaphore(TTS_CHUNK_PARALLELISM)
+    
+    async def synthesize_chunk(index):
+        async with semaphore:
+            try:
+                data = await edge_guard.call(
+                    lambda: synthesize_bytes(chunks[index], voice, timeout=timeout, connector=tts_runtime.connector())
+                )
+            except Exception as e:
+                _raise_tts_error(e, chunks[index], voice, timeout)
+            if not data:
+                raise Exception("No audio was received. Please verify that your parameters are correct.")
+            done[index] = data
+    
+    pending = [i for i in range(len(chunks)) if i not in done]
+    logger.info(f"Generating TTS in chunks: voice={voice}, chunks={len(chunks)}, pending={len(pending)}, parallelism={TTS_CHUNK_PARALLELISM}")
+    results = await asyncio.gather(*(synthesize_chunk(i) for i in pending), return_exceptions=True)
+    
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        logger.warning(f"{len(errors)}/{len(pending)} TTS chunks failed, {len(done)}/{len(chunks)} kept for retry")
+        raise errors[0]
+    
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_bytes(join_mp3_frames(done[i] for i in range(len(chunks))))
+    logger.info(f"Joined {len(chunks)} chunks into {output_path} ({output_path.stat().st_size} bytes)")
+    return True
+
+
+def generate_tts_with_retry(text, voice, output_path, policy=None):
+    """
+    Generate TTS audio, retrying failures as allowed by a RetryPolicy.
+    
+    The first attempt starts immediately and every attempt is capped by the
+    time left before the policy's deadline. When this returns False,
+    policy.give_up_reason says why.
     
     Args:
         text: Text to convert to speech
         voice: Voice shortname (e.g., 'en-US-AriaNeural')
         output_path: Path to save the audio file
-        max_retries: Maximum number of retry attempts (increased to 5)
-        fast_mode: If True, uses shorter delays to avoid timeouts (for webhooks)
+        policy: RetryPolicy tracking the deadline and per-error-class budgets
+            (default: a new one with the bot job deadline, TTS_JOB_DEADLINE)
     
     Returns:
         True if successful, False otherwise
     """
+    if policy is None:
+        policy = RetryPolicy(TTS_JOB_DEADLINE)
+    
     # Validate inputs
     if not text or not text.strip():
         logger.error("Empty text provided for TTS")
+        policy.give_up_reason = 'invalid'
         return False
     
-    if not voice:
-        logger.error("No voice specified for TTS")
-        return False
-    
-    # Validate voice format
-    if len(voice) < 5 or '-' not in voice:
+    if not voice or len(voice) < 5 or '-' not in voice:
         logger.error(f"Invalid voice format: {voice}")
+        policy.give_up_reason = 'invalid'
         return False
     
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Log environment info for debugging
-    is_heroku = bool(os.environ.get('DYNO'))
-    logger.info(f"TTS generation started: voice={voice}, text_len={len(text)}, heroku={is_heroku}, fast_mode={fast_mode}")
+    # Long texts are synthesized as concurrent sentence chunks; finished chunks survive retries
+    chunks = split_text(text, TTS_CHUNK_CHARS)
+    chunk_audio = {}
     
-    # Add initial delay to avoid immediate rate limiting (shorter in fast mode)
-    if fast_mode:
-        initial_delay = random.uniform(0.5, 1.5)  # Shorter delay for webhooks
-    else:
-        initial_delay = random.uniform(1, 3)
-    logger.info(f"Initial delay: {initial_delay:.2f}s before first attempt...")
-    time.sleep(initial_delay)
+    logger.info(f"TTS generation started: voice={voice}, text_len={len(text)}, chunks={len(chunks)}, deadline={policy.deadline}s")
     
-    for attempt in range(max_retries):
+    while True:
+        timeout = policy.attempt_timeout()
+        if timeout is None:
+            break
+        started = time.perf_counter()
         try:
-            # Add delay between retries (exponential backoff with jitter)
-            if attempt > 0:
-                if fast_mode:
-                    # Faster retries for webhooks to avoid H12 timeout
-                    base_wait = min(2 ** attempt, 5)  # Max 5 seconds base
-                    jitter = random.uniform(0, 1)  # Random jitter 0-1 seconds
-                else:
-                    base_wait = min(2 ** attempt, 15)  # Max 15 seconds base
-                    jitter = random.uniform(0, 3)  # Random jitter 0-3 seconds
-                wait_time = base_wait + jitter
-                logger.info(f"Retrying TTS generation (attempt {attempt + 1}/{max_retries}) after {wait_time:.2f}s delay...")
-                time.sleep(wait_time)
-            
-            # Increase timeout on later attempts (shorter in fast mode)
-            if fast_mode:
-                timeout = 10 + (attempt * 2)  # Start at 10s, increase by 2s per attempt
+            # Generate audio on the shared TTS event loop, bounded by the time left
+            if len(chunks) > 1:
+                coro = _generate_tts_chunked_async(chunks, voice, output_path, chunk_audio, timeout=timeout)
             else:
-                timeout = 30 + (attempt * 5)  # Start at 30s, increase by 5s per attempt
-            
-            # Generate audio using edge_tts with async/await
-            success = asyncio.run(_generate_tts_async(text, voice, output_path, timeout=timeout))
-            
+                coro = _generate_tts_async(text, voice, output_path, timeout=timeout)
+            with tracing.span('tts.attempt', attempt=policy.attempts, timeout=timeout, chunks=len(chunks)):
+                success = tts_runtime.run(coro, timeout=timeout)
             if success:
-                if attempt > 0:
-                    logger.info(f"TTS generation succeeded on attempt {attempt + 1}")
+                TTS_ATTEMPT_SECONDS.observe(time.perf_counter() - started, 'ok')
+                if policy.attempts > 1:
+                    logger.info(f"TTS generation succeeded: {policy.summary()}")
                 return True
-            else:
-                logger.warning(f"TTS generation returned False (attempt {attempt + 1})")
-                if attempt < max_retries - 1:
-                    continue  # Retry
-                
+            raise Exception("No audio was received. Please verify that your parameters are correct.")
         except Exception as e:
-            error_str = str(e)
-            # Check if it's a 403 error
-            if '403' in error_str or 'Edge TTS 403' in error_str:
-                logger.warning(f"Edge TTS 403 error (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    # For 403 errors, use longer delays (but shorter in fast mode)
-                    if attempt >= 2:
-                        if fast_mode:
-                            extra_delay = random.uniform(2, 4)
-                        else:
-                            extra_delay = random.uniform(5, 10)
-                        logger.info(f"Adding extra delay for 403 error: {extra_delay:.2f}s")
-                        time.sleep(extra_delay)
-                    continue  # Retry
-                else:
-                    logger.error(f"TTS generation failed after {max_retries} attempts due to 403 errors")
-                    return False
-            elif 'No audio was received' in error_str:
-                # This error might be retryable (could be temporary connection issue)
-                logger.warning(f"TTS 'No audio received' error (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    # Add delay before retrying (shorter in fast mode)
-                    if fast_mode:
-                        wait_time = random.uniform(1, 2)
-                    else:
-                        wait_time = random.uniform(2, 5)
-                    logger.info(f"Retrying after 'No audio received' error: {wait_time:.2f}s")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logger.error(f"TTS generation failed: No audio received after {max_retries} attempts. Voice: {voice}, Text length: {len(text)}")
-                    return False
-            else:
-                logger.error(f"TTS generation error (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    continue  # Retry
-                else:
-                    return False
-    
+            delay = policy.record_failure(e)
+            TTS_ATTEMPT_SECONDS.observe(time.perf_counter() - started, policy.last_error_class)
+            if delay is None:
+                break
+            TTS_RETRIES.inc(policy.last_error_class)
+            logger.warning(f"TTS attempt {policy.attempts} failed ({type(e).__name__}: {e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+    
+    TTS_GIVE_UPS.inc(policy.give_up_reason)
+    logger.error(f"TTS generation failed for voice={voice}, text_len={len(text)}: {policy.summary()}, last error: {policy.last_error}")
     return False
 
 
+def start_audio_stream(text, voice, policy):
+    """
+    Open an Edge TTS stream and wait for its first chunk, retrying failures
+    (before any audio is sent) as allowed by a RetryPolicy.
+    
+    Each attempt is bounded by the policy, including the wait for the first
+    chunk, so a stalled Edge connection cannot outlive the web deadline.
+    
+    Returns:
+        (audio iterator, first chunk, attempt start) or (None, None, None)
+        with policy.give_up_reason set
+    """
+    while True:
+        timeout = policy.attempt_timeout()
+        if timeout is None:
+            break
+        started = time.perf_counter()
+        audio = iter_audio_sync(text, voice, tts_runtime, guard=edge_guard, timeout=timeout)
+        try:
+            with tracing.span('tts.stream.first_chunk', attempt=policy.attempts, timeout=timeout):
+                first_chunk = next(audio, None)
+            if first_chunk is None:
+                raise Exception("No audio was received. Please verify that your parameters are correct.")
+            return audio, first_chunk, started
+        except Exception as e:
+            audio.close()
+            delay = policy.record_failure(e)
+            TTS_ATTEMPT_SECONDS.observe(time.perf_counter() - started, policy.last_error_class)
+            if delay is None:
+                break
+            TTS_RETRIES.inc(policy.last_error_class)
+            logger.warning(f"TTS stream attempt {policy.attempts} failed ({type(e).__name__}: {e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+    
+    TTS_GIVE_UPS.inc(policy.give_up_reason)
+    logger.error(f"TTS stream failed to start: voice={voice}, text_len={len(text)}: {policy.summary()}, last error: {policy.last_error}")
+    return None, None, None
+
+
+def edge_busy_response():
+    """503 for web clients while the Edge TTS circuit breaker is open."""
+    wait = max(1, round(edge_guard.breaker.retry_after()))
+    response = jsonify({
+        "error": f"The speech service is temporarily overloaded. Please try again in about {wait} seconds.",
+        "reason": "unavailable"
+    })
+    response.headers['Retry-After'] = str(wait)
+    return response, 503
+
+
+def synthesize_cached(text, voice, policy):
+    """
+    Return the cache key for audio of (voice, text), synthesizing it on a miss
+    within the given RetryPolicy.
+    
+    Concurrent misses for the same key (web and bot alike) share a single
+    synthesis, and a live /tts/stream for the key is waited for rather than
+    repeated; callers that joined either wait at most for their own deadline.
+    The leader checks the cache again, since the previous synthesis may have
+    finished after our miss.
+    
+    Returns:
+        The cache key, or None if generation failed
+    """
+    key = cache_key(voice, text)
+    if audio_cache.ensure_file(key) is not None:
+        logger.info(f"Audio cache hit: voice={voice}, key={key[:12]}")
+        return key
+    
+    try:
+        with tracing.span('tts.synthesize', voice=voice, chars=len(text)) as current:
+            (result, reason), shared = tts_flights.do(
+                key,
+                lambda: _synthesize_into_cache(key, text, voice, policy),
+                timeout=max(0.0, policy.remaining())
+            )
+            if current:
+                current.attrs['joined'] = shared
+    except TimeoutError:
+        policy.give_up_reason = 'deadline'
+        return None
+    if shared:
+        logger.info(f"Joined in-flight synthesis: voice={voice}, key={key[:12]}")
+        policy.give_up_reason = reason
+    return result
+
+
+def _synthesize_into_cache(key, text, voice, policy):
+    """Synthesize into the audio cache; returns (key or None, give-up reason)."""
+    if audio_cache.ensure_file(key) is not None:
+        return key, None
+    
+    tmp_path = audio_cache.cache_dir / f"{uuid.uuid4()}.part"
+    try:
+        if not generate_tts_with_retry(text, voice, tmp_path, policy):
+            return None, policy.give_up_reason
+        audio_cache.put_file(key, tmp_path)
+        return key, None
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
 def send_document(chat_id, document_path, caption=None):
     """Send document via Telegram Bot API."""
-    url = f"{TELEGRAM_API_URL}/sendDocument"
-    
     try:
         with open(document_path, 'rb') as doc_file:
             files = {'document': doc_file}
@@ -367,55 +594,62 @@ def send_document(chat_id, document_path, caption=None):
             if caption:
                 data['caption'] = caption
             
-            response = requests.post(url, files=files, data=data, timeout=30)
-            return response.json()
+            return telegram.call('sendDocument', data, files=files)
     except Exception as e:
         logger.error(f"Error sending document: {e}")
         return None
 
 
+def send_document_data(chat_id, filename, data, caption=None):
+    """Send in-memory bytes as a document via Telegram Bot API."""
+    try:
+        files = {'document': (filename, data)}
+        payload = {'chat_id': chat_id}
+        if caption:
+            payload['caption'] = caption
+        
+        return telegram.call('sendDocument', payload, files=files)
+    except Exception as e:
+        logger.error(f"Error sending document: {e}")
+        return None
+
+
+# (catalog version, HTML shell, voices JSON) for the web interface
+_web_index = None
+_web_index_lock = threading.Lock()
+
+
+def get_web_index():
+    """Return the HTML shell and voices JSON assets, built once per catalog version."""
+    global _web_index
+    catalog = get_catalog()
+    cached = _web_index
+    if cached and cached[0] == catalog.version:
+        return cached[1], cached[2]
+    
+    with _web_index_lock:
+        if _web_index and _web_index[0] == catalog.version:
+            return _web_index[1], _web_index[2]
+        voices = WebAsset(catalog.web_json, 'application/json')
+        html = render_template(
+            'index.html',
+            countries=list(catalog.web_tree),
+            voices_url=url_for('voices_json', version=voices.version)
+        )
+        shell = WebAsset(html.encode('utf-8'), 'text/html')
+        _web_index = (catalog.version, shell, voices)
+        logger.info(f"Web index built for catalog {catalog.version}: shell {len(shell.data)} bytes, "
+                    f"voices {len(voices.data)} bytes ({len(voices.gzipped)} gzipped)")
+        return shell, voices
+
+
 @app.route('/')
 def index():
     """Serve the main HTML page."""
     try:
-        # Load voices and organize them by country and language for the web interface
-        voices = load_voice_list()
-        
-        # Organize voices into nested structure: {country: {language: [voices]}}
-        voices_dict = {}
-        for voice in voices:
-            locale = voice.get('Locale', '')
-            
-            # Extract country and language from Locale if CountryName/LanguageName not present
-            if 'CountryName' in voice and 'LanguageName' in voice:
-                country_name = voice.get('CountryName', 'Unknown')
-                language_name = voice.get('LanguageName', 'Unknown')
-            else:
-                # Fallback: parse from Locale (e.g., "en-US" -> "United States", "English")
-                parts = locale.split('-') if locale else []
-                if len(parts) == 2:
-                    language_code, country_code = parts
-                    try:
-                        import pycountry
-                        country = pycountry.countries.get(alpha_2=country_code.upper())
-                        language = pycountry.languages.get(alpha_2=language_code.lower())
-                        country_name = country.name if country else country_code.upper()
-                        language_name = language.name if language else language_code.upper()
-                    except:
-                        country_name = country_code.upper()
-                        language_name = language_code.upper()
-                else:
-                    country_name = 'Unknown'
-                    language_name = 'Unknown'
-            
-            if country_name not in voices_dict:
-                voices_dict[country_name] = {}
-            if language_name not in voices_dict[country_name]:
-                voices_dict[country_name][language_name] = []
-            
-            voices_dict[country_name][language_name].append(voice)
-        
-        return render_template('index.html', voices=voices_dict)
+        shell, _ = get_web_index()
+        # Revalidated on every visit; the ETag changes with the voice catalog
+        return shell.response('no-cache')
     except Exception as e:
         logger.error(f"Error loading index.html: {e}", exc_info=True)
         return jsonify({
@@ -425,6 +659,16 @@ def index():
         }), 500
 
 
+@app.route('/voices/<version>.json')
+def voices_json(version):
+    """Serve the web voices tree; the URL embeds its content hash, so it is cached for good."""
+    _, voices = get_web_index()
+    if version != voices.version:
+        # A page rendered for an older catalog; serve the current tree but do not pin it
+        return voices.response('no-cache')
+    return voices.response(IMMUTABLE_CACHE)
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check for Heroku."""
@@ -457,36 +701,23 @@ def tts():
         if len(text) > MAX_TEXT_LENGTH:
             return jsonify({"error": f"Text exceeds maximum length of {MAX_TEXT_LENGTH} characters"}), 400
         
-        # Generate audio
+        # Generate audio (served from the cache when this voice/text was seen before)
         try:
-            user_audio_dir = BASE_AUDIO_DIR / 'web'
-            user_audio_dir.mkdir(parents=True, exist_ok=True)
-            
-            filename = f"{uuid.uuid4()}.mp3"
-            output_path = user_audio_dir / filename
-            
-            # Generate audio with retry logic (improved: 5 retries with delays)
-            success = generate_tts_with_retry(text, voice_shortname, output_path, max_retries=5)
+            policy = RetryPolicy(TTS_WEB_DEADLINE)
+            with tracing.start_trace('web.tts', voice=voice_shortname, chars=len(text)):
+                key = synthesize_cached(text, voice_shortname, policy)
             
-            if success:
-                # Verify file exists before returning
-                if not output_path.exists() or output_path.stat().st_size == 0:
-                    logger.error(f"Generated file is missing or empty: {output_path}")
-                    return jsonify({"error": "Generated audio file is invalid"}), 500
-                
-                # Generate URL for the audio file
-                audio_url = f"/static/audio/web/{filename}"
-                
-                # Cleanup old files (don't fail if cleanup fails)
-                try:
-                    cleanup_audio_files('web')
-                except Exception as cleanup_error:
-                    logger.warning(f"Cleanup failed (non-critical): {cleanup_error}")
-                
+            if key:
+                audio_url = f"/static/audio/cache/{key}.mp3"
                 return jsonify({"audio_url": audio_url}), 200
+            elif policy.give_up_reason == 'unavailable':
+                return edge_busy_response()
             else:
-                logger.error(f"TTS generation failed after retries for web interface")
-                return jsonify({"error": "Failed to generate audio. This may be due to rate limiting. Please try again in a few moments."}), 500
+                logger.error(f"TTS generation failed for web interface: {policy.give_up_reason}")
+                return jsonify({
+                    "error": "Failed to generate audio. This may be due to rate limiting. Please try again in a few moments.",
+                    "reason": policy.give_up_reason
+                }), 500
                 
         except OSError as e:
             logger.error(f"File system error in TTS endpoint: {e}", exc_info=True)
@@ -504,24 +735,120 @@ def tts():
         return jsonify({"error": f"An unexpected error occurred: {error_msg}"}), 500
 
 
+@app.route('/tts/stream', methods=['GET'])
+def tts_stream():
+    """
+    Stream synthesized audio to the web interface while it is generated.
+    
+    Edge TTS chunks are written straight into a chunked audio/mpeg response,
+    so playback starts with the first chunk. Concurrent requests for the same
+    audio share one Edge stream, which later requests replay from the start;
+    a synthesis already running for /tts or a bot job is waited for instead.
+    The completed audio is stored in the cache; cached audio is returned directly.
+    """
+    text = request.args.get('text', '').strip()
+    voice_shortname = request.args.get('voice', '')
+    
+    # Validation
+    if not text:
+        return jsonify({"error": "Text is required"}), 400
+    
+    if not voice_shortname:
+        return jsonify({"error": "Voice selection is required"}), 400
+    
+    if len(text) > MAX_TEXT_LENGTH:
+        return jsonify({"error": f"Text exceeds maximum length of {MAX_TEXT_LENGTH} characters"}), 400
+    
+    key = cache_key(voice_shortname, text)
+    data = audio_cache.get(key)
+    if data is not None:
+        return Response(data, mimetype='audio/mpeg')
+    
+    policy = RetryPolicy(TTS_WEB_DEADLINE)
+    try:
+        stream, shared = tts_flights.stream(key, lambda stream: threading.Thread(
+            target=_produce_stream,
+            args=(key, text, voice_shortname, policy, stream),
+            name='tts-stream',
+            daemon=True
+        ).start(), timeout=max(0.0, policy.remaining()))
+        if shared:
+            logger.info(f"Joined live stream: voice={voice_shortname}, key={key[:12]}")
+        
+        # Fail with a proper status if Edge rejects us before any audio is sent
+        chunks = stream.read(first_timeout=max(0.0, policy.remaining()), timeout=TTS_WEB_DEADLINE)
+        first_chunk = next(chunks)
+    except GiveUpError as e:
+        policy.give_up_reason = e.reason
+    except TimeoutError:
+        policy.give_up_reason = 'deadline'
+    else:
+        def generate():
+            yield first_chunk
+            try:
+                yield from chunks
+            except Exception:
+                return  # Logged by the producer
+        
+        return Response(generate(), mimetype='audio/mpeg', headers={
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        })
+    
+    if policy.give_up_reason == 'unavailable':
+        return edge_busy_response()
+    return jsonify({
+        "error": "Failed to generate audio. This may be due to rate limiting. Please try again in a few moments.",
+        "reason": policy.give_up_reason
+    }), 502
+
+
+def _produce_stream(key, text, voice, policy, stream):
+    """
+    Feed a shared /tts/stream from Edge TTS and cache the finished audio.
+    
+    Runs in its own thread so the stream outlives any one client: readers
+    that disconnect do not cut it short for the others. Audio cached since
+    the request missed (e.g. by a /tts call it waited for) is replayed as is.
+    """
+    error = None
+    try:
+        data = audio_cache.get(key)
+        if data is not None:
+            stream.append(data)
+            return
+        with tracing.start_trace('web.tts.stream', voice=voice, chars=len(text)):
+            audio, first_chunk, started = start_audio_stream(text, voice, policy)
+            if audio is None:
+                error = GiveUpError(policy.give_up_reason)
+                return
+            parts = [first_chunk]
+            stream.append(first_chunk)
+            try:
+                for chunk in audio:
+                    parts.append(chunk)
+                    stream.append(chunk)
+            except Exception as e:
+                TTS_ATTEMPT_SECONDS.observe(time.perf_counter() - started, classify_error(e))
+                raise
+            finally:
+                audio.close()
+            TTS_ATTEMPT_SECONDS.observe(time.perf_counter() - started, 'ok')
+            audio_cache.put(key, b''.join(parts))
+    except Exception as e:
+        logger.error(f"TTS stream interrupted: voice={voice}, error={e}")
+        error = e
+    finally:
+        tts_flights.finish(key, stream, error)
+
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     """Serve static files."""
     try:
-        # Handle audio files specially
+        # Generated audio lives under BASE_AUDIO_DIR (/tmp/static/audio on Heroku)
         if filename.startswith('audio/'):
-            # On Heroku, audio files are in /tmp/static/audio
-            # On local, they're in static/audio
-            if os.environ.get('DYNO'):  # Heroku
-                audio_path = Path('/tmp/static') / filename
-            else:
-                audio_path = Path('static') / filename
-            
-            if audio_path.exists() and audio_path.is_file():
-                return send_from_directory(str(audio_path.parent), audio_path.name)
-            else:
-                logger.warning(f"Audio file not found: {audio_path}")
-                return jsonify({"error": "Audio file not found"}), 404
+            return serve_audio(filename[len('audio/'):])
         
         # Other static files
         return send_from_directory('static', filename)
@@ -530,6 +857,83 @@ def serve_static(filename):
         return jsonify({"error": f"Error serving file: {str(e)}"}), 500
 
 
+def serve_audio(name):
+    """
+    Send a generated audio file with Range, conditional GET and caching support.
+    
+    Cache entries are named by the hash of (voice, text) and never change,
+    so the name is their strong ETag and they are cached as immutable.
+    send_file hands the open file to the server's wsgi.file_wrapper, which
+    gunicorn streams with sendfile() (not for partial ranges).
+    """
+    audio_path = safe_join(str(BASE_AUDIO_DIR.resolve()), name)
+    if audio_path is None:
+        return jsonify({"error": "Audio file not found"}), 404
+    
+    stem, ext = os.path.splitext(name[len('cache/'):]) if name.startswith('cache/') else (None, None)
+    content_addressed = ext == '.mp3' and CACHE_KEY_RE.fullmatch(stem) is not None
+    try:
+        if content_addressed:
+            response = send_file(audio_path, mimetype='audio/mpeg', conditional=True, etag=stem)
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        else:
+            response = send_file(audio_path, conditional=True, max_age=AUDIO_EXPIRY_TIME)
+    except (FileNotFoundError, IsADirectoryError):
+        logger.warning(f"Audio file not found: {audio_path}")
+        return jsonify({"error": "Audio file not found"}), 404
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@app.route('/status', methods=['GET'])
+def status():
+    """Runtime status of background subsystems."""
+    return jsonify({
+        "status": "ok",
+        "tts_queue": tts_queue.stats(),
+        "tts_runtime": tts_runtime.stats(),
+        "edge": edge_guard.stats(),
+        "single_flight": tts_flights.stats(),
+        "update_recorder": update_recorder.stats() if update_recorder else None,
+        "audio_cache": audio_cache.stats(),
+        "audio_reaper": audio_reaper.stats(),
+        "keyboard_cache": keyboard_cache.stats(),
+        "file_ids": file_id_index.stats(),
+        "telegram_api": telegram.stats(),
+        "broadcast": broadcast_engine.status(),
+        "state_store": state_store.stats()
+    }), 200
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of this worker process."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/traces/slow')
+def slow_traces():
+    """Span trees of the slowest recently completed traces (?n=10)."""
+    n = request.args.get('n', 10, type=int)
+    return jsonify({"stats": tracing.stats(), "traces": tracing.slowest(n)}), 200
+
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sample all threads for ?seconds=N and return collapsed stacks (requires PROFILE_TOKEN)."""
+    token = request.headers.get('X-Profile-Token') or request.args.get('token', '')
+    if not PROFILE_TOKEN or not hmac.compare_digest(token, PROFILE_TOKEN):
+        return jsonify({"error": "Not found"}), 404
+    
+    # Stay under Heroku's 30s router timeout; use the /profile bot command for longer runs
+    seconds = max(1, min(request.args.get('seconds', 10, type=int), 25))
+    try:
+        stacks = profiler.profile(seconds)
+    except ProfilerBusyError:
+        return jsonify({"error": "A profile is already running"}), 409
+    return Response(stacks, mimetype='text/plain')
+
+
 @app.route('/test', methods=['GET', 'POST'])
 def test():
     """Test endpoint to verify app is running."""
@@ -554,32 +958,45 @@ def webhook():
             logger.warning("Empty update received")
             return jsonify({"ok": False, "error": "Empty update"}), 400
         
-        # Handle message
-        if 'message' in update:
-            try:
-                handle_message(update['message'])
-            except Exception as e:
-                logger.error(f"Error handling message: {e}", exc_info=True)
-                # Still return ok to Telegram to avoid retries
-                return jsonify({"ok": True, "error": str(e)})
+        if update_recorder:
+            update_recorder.record(update)
         
-        # Handle callback query
-        elif 'callback_query' in update:
-            try:
-                handle_callback_query(update['callback_query'])
-            except Exception as e:
-                logger.error(f"Error handling callback: {e}", exc_info=True)
-                return jsonify({"ok": True, "error": str(e)})
-        
-        else:
-            logger.debug(f"Unhandled update type: {update.keys()}")
+        update_type = next((kind for kind in ('message', 'callback_query') if kind in update), 'other')
+        with tracing.start_trace('update', type=update_type, update_id=update.get('update_id')), WEBHOOK_SECONDS.time(update_type):
+            error = dispatch_update(update)
         
+        if error:
+            # Still return ok to Telegram to avoid retries
+            return jsonify({"ok": True, "error": error})
         return jsonify({"ok": True})
     except Exception as e:
         logger.error(f"Webhook error: {e}", exc_info=True)
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+def dispatch_update(update):
+    """Route an update to its handler. Returns the handler's error message, if any."""
+    # Handle message
+    if 'message' in update:
+        try:
+            handle_message(update['message'])
+        except Exception as e:
+            logger.error(f"Error handling message: {e}", exc_info=True)
+            return str(e)
+    
+    # Handle callback query
+    elif 'callback_query' in update:
+        try:
+            handle_callback_query(update['callback_query'])
+        except Exception as e:
+            logger.error(f"Error handling callback: {e}", exc_info=True)
+            return str(e)
+    
+    else:
+        logger.debug(f"Unhandled update type: {update.keys()}")
+    return None
+
+
 def handle_message(message):
     """Handle incoming messages."""
     user_id = message['from']['id']
@@ -600,7 +1017,7 @@ def handle_message(message):
     # Handle media
     elif any(key in message for key in ['photo', 'video', 'audio', 'document', 'voice', 'video_note']):
         # Check if broadcast mode
-        if user_states.get(user_id) == 'broadcast_waiting':
+        if state_store.get(user_id).get('state') == 'broadcast_waiting':
             handle_broadcast_message(message)
         else:
             handle_media(message)
@@ -622,6 +1039,8 @@ def handle_command(message):
         cmd_get_userlist(message)
     elif text == '/stopbroadcast' and is_owner(user_id):
         cmd_stop_broadcast(message)
+    elif text.split()[0] == '/profile' and is_owner(user_id):
+        cmd_profile(message)
 
 
 def cmd_start(message):
@@ -648,20 +1067,18 @@ def cmd_start(message):
         send_message(chat_id, join_message, reply_markup=create_join_keyboard())
         return
     
-    # Load voices and show countries
-    voices = load_voice_list()
-    if not voices:
+    # Show countries from the voice catalog
+    catalog = get_catalog()
+    if not catalog.get_countries():
         send_message(chat_id, "❌ No voices available. Please contact the bot owner.")
         return
     
-    countries = get_countries(voices)
-    user_states[user_id] = 'selecting_country'
-    user_data[user_id] = {'countries': countries, 'country_page': 0}
+    state_store.set(user_id, {'state': 'selecting_country'})
     
     send_message(
         chat_id,
         "🌍 *Select Your Country:*",
-        reply_markup=create_country_keyboard(countries, page=0)
+        reply_markup=keyboard_cache.country(catalog)
     )
 
 
@@ -672,19 +1089,17 @@ def register_user_sync(user_id):
         
         if is_new:
             # Notify owner
-            users = load_users()
+            user_count = get_user_count()
             message_text = (
                 f"🎉 **New User Alert!**\n\n"
                 f"👤 User ID: `{user_id}`\n"
-                f"📊 Total Users: **{len(users)}**\n\n"
+                f"📊 Total Users: **{user_count}**\n\n"
                 f"📎 Updated user database attached below."
             )
             send_message(OWNER_ID, message_text)
             
-            # Send userid.json
-            user_file = Path('userid.json')
-            if user_file.exists():
-                send_document(OWNER_ID, str(user_file), f"📋 Updated user database ({len(users)} users)")
+            # Send userid.json (serialized from memory, the file itself is compacted lazily)
+            send_document_data(OWNER_ID, 'userid.json', user_store.export_json(), f"📋 Updated user database ({user_count} users)")
             
             logger.info(f"New user registered: {user_id}")
     except Exception as e:
@@ -693,176 +1108,175 @@ def register_user_sync(user_id):
 
 def handle_callback_query(callback_query):
     """Handle callback queries."""
-    user_id = callback_query['from']['id']
-    chat_id = callback_query['message']['chat']['id']
-    message_id = callback_query['message']['message_id']
-    data = callback_query['data']
     callback_id = callback_query['id']
     
-    answer_callback_query(callback_id)
-    
-    if data.startswith('country_page:'):
-        handle_country_pagination(callback_query)
-    elif data.startswith('country:'):
-        handle_country_selection(callback_query)
-    elif data.startswith('language:'):
-        handle_language_selection(callback_query)
-    elif data.startswith('voice_page:'):
-        handle_voice_pagination(callback_query)
-    elif data.startswith('voice:'):
-        handle_voice_selection(callback_query)
-    elif data == 'back_to_countries':
-        handle_back_to_countries(callback_query)
-    elif data == 'back_to_languages':
-        handle_back_to_languages(callback_query)
-
-
-def handle_country_selection(callback_query):
+    # Buttons carry catalog ids, so they are only valid for the catalog they were built from
+    catalog = get_catalog()
+    decoded = callback_data.decode(callback_query['data'])
+    if decoded is None or decoded[0] != catalog.version:
+        answer_callback_query_async(callback_id, "This menu is out of date.")
+        show_menu_expired(callback_query)
+        return
+    _, kind, ids = decoded
+    
+    answer_callback_query_async(callback_id)
+    
+    if kind == callback_data.COUNTRY_PAGE:
+        handle_country_pagination(callback_query, catalog, *ids)
+    elif kind == callback_data.COUNTRY:
+        handle_country_selection(callback_query, catalog, *ids)
+    elif kind == callback_data.LANGUAGE:
+        handle_language_selection(callback_query, catalog, *ids)
+    elif kind == callback_data.VOICE_PAGE:
+        handle_voice_pagination(callback_query, catalog, *ids)
+    elif kind == callback_data.VOICE:
+        handle_voice_selection(callback_query, catalog, *ids)
+    elif kind == callback_data.BACK_TO_COUNTRIES:
+        handle_back_to_countries(callback_query, catalog)
+    elif kind == callback_data.BACK_TO_LANGUAGES:
+        handle_back_to_languages(callback_query, catalog, *ids)
+
+
+def show_menu(callback_query, text, reply_markup=None):
+    """
+    Move the menu a button belongs to on to its next screen.
+    
+    With MENU_EDIT_IN_PLACE the menu message is rewritten with one
+    editMessageText; otherwise (or if the edit fails, e.g. the message is
+    too old) its keyboard is removed and the screen is sent as a new message.
+    """
+    chat_id = callback_query['message']['chat']['id']
+    message_id = callback_query['message']['message_id']
+    if MENU_EDIT_IN_PLACE:
+        result = edit_message_text(chat_id, message_id, text, reply_markup)
+        if result and (result.get('ok') or 'message is not modified' in result.get('description', '')):
+            return result
+        logger.warning(f"Editing menu {message_id} failed ({result and result.get('description')}), sending a new one")
+    else:
+        edit_message_reply_markup(chat_id, message_id, None)
+    return send_message(chat_id, text, reply_markup=reply_markup)
+
+
+def show_menu_expired(callback_query):
+    """Tell the user their menu is stale (expired or catalog changed)."""
+    show_menu(callback_query, "⌛ This menu has expired. Please use /start to choose a voice again.")
+
+
+def handle_country_selection(callback_query, catalog, country_id):
     """Handle country selection."""
     user_id = callback_query['from']['id']
     chat_id = callback_query['message']['chat']['id']
-    data = callback_query['data']
     
-    country_name = data.split(':', 1)[1].replace('_', ' ')
-    
-    voices = load_voice_list()
-    languages = get_languages(voices, country_name)
+    country_name = catalog.country_name(country_id)
+    languages = catalog.get_languages(country_name)
     
     if not languages:
         send_message(chat_id, "❌ No languages available for the selected country.")
-        user_states.pop(user_id, None)
+        state_store.update(user_id, state=None)
         return
     
-    user_states[user_id] = 'selecting_language'
-    user_data[user_id]['selected_country'] = country_name
+    state_store.update(user_id, state='selecting_language')
     
-    edit_message_reply_markup(chat_id, callback_query['message']['message_id'], None)
-    send_message(
-        chat_id,
+    show_menu(
+        callback_query,
         f"🗣️ *Select Your Language in {country_name}:*",
-        reply_markup=create_language_keyboard(languages)
+        reply_markup=keyboard_cache.language(catalog, country_id)
     )
 
 
-def handle_language_selection(callback_query):
+def handle_language_selection(callback_query, catalog, country_id, language_id):
     """Handle language selection."""
     user_id = callback_query['from']['id']
     chat_id = callback_query['message']['chat']['id']
-    data = callback_query['data']
-    
-    language_name = data.split(':', 1)[1].replace('_', ' ')
-    country_name = user_data[user_id].get('selected_country')
     
-    voices = load_voice_list()
-    selected_voices = get_voices(voices, country_name, language_name)
+    country_name = catalog.country_name(country_id)
+    language_name = catalog.language_name(country_name, language_id)
+    selected_voices = catalog.get_voices(country_name, language_name)
     
     if not selected_voices:
         send_message(chat_id, "❌ No voices available for the selected language.")
-        user_states.pop(user_id, None)
+        state_store.update(user_id, state=None)
         return
     
-    user_states[user_id] = 'selecting_voice'
-    user_data[user_id]['selected_language'] = language_name
+    state_store.update(user_id, state='selecting_voice')
     
-    edit_message_reply_markup(chat_id, callback_query['message']['message_id'], None)
-    send_message(
-        chat_id,
+    show_menu(
+        callback_query,
         f"🎤 *Select Your Voice in {language_name}:*",
-        reply_markup=create_voice_keyboard(selected_voices)
+        reply_markup=keyboard_cache.voice(catalog, country_id, language_id)
     )
 
 
-def handle_voice_selection(callback_query):
+def handle_voice_selection(callback_query, catalog, voice_id):
     """Handle voice selection."""
     user_id = callback_query['from']['id']
-    chat_id = callback_query['message']['chat']['id']
-    data = callback_query['data']
     
-    voice_name = data.split(':', 1)[1].replace('_', ' ')
+    voice = catalog.voice_by_id(voice_id)
+    if not voice:
+        show_menu_expired(callback_query)
+        return
+    voice_name = voice['ShortName']
     
-    user_states[user_id] = 'ready_for_text'
-    user_data[user_id]['selected_voice'] = voice_name
+    state_store.update(user_id, state='ready_for_text', voice=voice_name)
     
-    edit_message_reply_markup(chat_id, callback_query['message']['message_id'], None)
-    send_message(
-        chat_id,
+    show_menu(
+        callback_query,
         f"✅ *Voice set to:* {voice_name}\n\n📝 Please send the text you want to convert to speech."
     )
 
 
-def handle_country_pagination(callback_query):
+def handle_country_pagination(callback_query, catalog, page):
     """Handle country pagination."""
-    user_id = callback_query['from']['id']
     chat_id = callback_query['message']['chat']['id']
     message_id = callback_query['message']['message_id']
-    data = callback_query['data']
-    
-    page = int(data.split(':', 1)[1])
-    countries = user_data[user_id].get('countries', [])
     
     edit_message_reply_markup(
         chat_id,
         message_id,
-        create_country_keyboard(countries, page)
+        keyboard_cache.country(catalog, page)
     )
 
 
-def handle_voice_pagination(callback_query):
+def handle_voice_pagination(callback_query, catalog, country_id, language_id, page):
     """Handle voice pagination."""
-    user_id = callback_query['from']['id']
     chat_id = callback_query['message']['chat']['id']
     message_id = callback_query['message']['message_id']
-    data = callback_query['data']
-    
-    page = int(data.split(':', 1)[1])
-    country_name = user_data[user_id].get('selected_country')
-    language_name = user_data[user_id].get('selected_language')
-    
-    voices = load_voice_list()
-    selected_voices = get_voices(voices, country_name, language_name)
     
     edit_message_reply_markup(
         chat_id,
         message_id,
-        create_voice_keyboard(selected_voices, page)
+        keyboard_cache.voice(catalog, country_id, language_id, page)
     )
 
 
-def handle_back_to_countries(callback_query):
+def handle_back_to_countries(callback_query, catalog):
     """Handle back to countries."""
     user_id = callback_query['from']['id']
-    chat_id = callback_query['message']['chat']['id']
-    
-    voices = load_voice_list()
-    countries = get_countries(voices)
     
-    user_states[user_id] = 'selecting_country'
-    user_data[user_id]['countries'] = countries
+    state_store.update(user_id, state='selecting_country')
     
-    edit_message_reply_markup(chat_id, callback_query['message']['message_id'], None)
-    send_message(
-        chat_id,
+    show_menu(
+        callback_query,
         "🌍 *Select Your Country:*",
-        reply_markup=create_country_keyboard(countries)
+        reply_markup=keyboard_cache.country(catalog)
     )
 
 
-def handle_back_to_languages(callback_query):
+def handle_back_to_languages(callback_query, catalog, country_id):
     """Handle back to languages."""
     user_id = callback_query['from']['id']
-    chat_id = callback_query['message']['chat']['id']
-    country_name = user_data[user_id].get('selected_country')
-    
-    voices = load_voice_list()
-    languages = get_languages(voices, country_name)
+    country_name = catalog.country_name(country_id)
+    if country_name is None:
+        # Not a country of this catalog: treat like a stale button and start over
+        handle_back_to_countries(callback_query, catalog)
+        return
     
-    user_states[user_id] = 'selecting_language'
+    state_store.update(user_id, state='selecting_language')
     
-    edit_message_reply_markup(chat_id, callback_query['message']['message_id'], None)
-    send_message(
-        chat_id,
+    show_menu(
+        callback_query,
         f"🗣️ *Select Your Language in {country_name}:*",
-        reply_markup=create_language_keyboard(languages)
+        reply_markup=keyboard_cache.language(catalog, country_id)
     )
 
 
@@ -872,13 +1286,15 @@ def handle_text_message(message):
     chat_id = message['chat']['id']
     text = message['text'].strip()
     
+    state = state_store.get(user_id)
+    
     # Check if user is in broadcast mode
-    if user_states.get(user_id) == 'broadcast_waiting':
+    if state.get('state') == 'broadcast_waiting':
         handle_broadcast_message(message)
         return
     
     # Regular TTS handling
-    if user_states.get(user_id) != 'ready_for_text':
+    if state.get('state') != 'ready_for_text':
         send_message(chat_id, '🛑 *Error:* Please select a voice using the /start command first.')
         return
     
@@ -890,7 +1306,7 @@ def handle_text_message(message):
         send_message(chat_id, f'🛑 *Error:* Text exceeds the maximum allowed length of {MAX_TEXT_LENGTH} characters.')
         return
     
-    voice = user_data[user_id].get('selected_voice')
+    voice = state.get('voice')
     if not voice:
         send_message(chat_id, '🛑 *Error:* Please select a voice using the /start command.')
         return
@@ -898,22 +1314,38 @@ def handle_text_message(message):
     # Forward to owner
     forward_message(OWNER_ID, chat_id, message['message_id'])
     
-    # Generate TTS
-    user_audio_dir = BASE_AUDIO_DIR / str(user_id)
-    user_audio_dir.mkdir(parents=True, exist_ok=True)
-    
-    filename = f"{uuid.uuid4()}.mp3"
-    output_path = user_audio_dir / filename
-    
-    # Generate audio with retry logic (fast mode for webhook to avoid H12 timeout)
-    success = generate_tts_with_retry(text, voice, output_path, max_retries=5, fast_mode=True)
-    
-    if success:
-        send_audio(chat_id, str(output_path))
-        output_path.unlink()
-        cleanup_audio_files(user_id)
+    # Hand off synthesis to the TTS workers so the webhook returns immediately
+    try:
+        tts_queue.submit(process_tts_job, user_id, chat_id, text, voice)
+    except QueueFullError:
+        send_message(chat_id, '⏳ *Busy:* Too many requests are being processed right now. Please try again in a minute.')
+
+
+def process_tts_job(user_id, chat_id, text, voice):
+    """Generate audio for a queued TTS request and send it to the user (runs on a TTS worker)."""
+    key = cache_key(voice, text)
+    
+    # Audio Telegram already has is re-sent by reference, skipping synthesis and upload
+    file_id = file_id_index.get(key)
+    if file_id:
+        if get_sent_file_id(send_audio_by_file_id(chat_id, file_id)):
+            return
+        logger.warning(f"Telegram rejected cached file_id for key {key[:12]}, re-uploading")
+        file_id_index.discard(key)
+    
+    # Generate audio with retries bounded by the job deadline
+    policy = RetryPolicy(TTS_JOB_DEADLINE)
+    key = synthesize_cached(text, voice, policy)
+    
+    if key:
+        file_id = get_sent_file_id(send_audio(chat_id, str(audio_cache.path(key))))
+        if file_id:
+            file_id_index.set(key, file_id)
+    elif policy.give_up_reason == 'unavailable':
+        wait = max(1, round(edge_guard.breaker.retry_after()))
+        send_message(chat_id, f'⏳ *Busy:* The speech service is temporarily overloaded. Please try again in about {wait} seconds.')
     else:
-        logger.error(f"TTS generation failed after retries for user {user_id}. Voice: {voice}, Text length: {len(text)}")
+        logger.error(f"TTS generation failed for user {user_id} ({policy.give_up_reason}). Voice: {voice}, Text length: {len(text)}")
         send_message(chat_id, '❌ *Error:* Failed to generate audio. This may be due to rate limiting or invalid voice parameters. Please try again in a few moments or select a different voice.')
 
 
@@ -923,7 +1355,7 @@ def handle_broadcast_message(message):
     chat_id = message['chat']['id']
     
     if not is_owner(user_id):
-        user_states.pop(user_id, None)
+        state_store.update(user_id, state=None)
         send_message(chat_id, "⛔ Unauthorized. Broadcast cancelled.")
         return
     
@@ -932,7 +1364,12 @@ def handle_broadcast_message(message):
     
     if total_users == 0:
         send_message(chat_id, "❌ No users in database to broadcast to.")
-        user_states.pop(user_id, None)
+        state_store.update(user_id, state=None)
+        return
+    
+    if broadcast_engine.active():
+        send_message(chat_id, "⚠️ A broadcast is already running. Send /stopbroadcast to stop it first.")
+        state_store.update(user_id, state=None)
         return
     
     # Show progress
@@ -940,86 +1377,17 @@ def handle_broadcast_message(message):
         chat_id,
         f"📤 **Broadcasting...**\n\n"
         f"👥 Sending to {total_users:,} users...\n"
-        f"⏱️ Estimated time: ~{int(total_users * 0.05 / 60)} minutes"
+        f"⏱️ Estimated time: ~{int(total_users / BROADCAST_RATE / 60)} minutes"
     )
+    state_store.update(user_id, state=None)
     
-    success_count = 0
-    failed_count = 0
-    blocked_count = 0
-    
-    # Copy message to all users
-    for idx, target_user_id in enumerate(users, 1):
-        if target_user_id == OWNER_ID:
-            continue
-        
-        try:
-            # Copy message
-            url = f"{TELEGRAM_API_URL}/copyMessage"
-            payload = {
-                'chat_id': target_user_id,
-                'from_chat_id': chat_id,
-                'message_id': message['message_id']
-            }
-            response = requests.post(url, json=payload, timeout=10)
-            
-            if response.json().get('ok'):
-                success_count += 1
-            else:
-                error_text = response.json().get('description', '').lower()
-                if 'blocked' in error_text:
-                    blocked_count += 1
-                else:
-                    failed_count += 1
-        except Exception as e:
-            error_msg = str(e).lower()
-            if 'blocked' in error_msg:
-                blocked_count += 1
-            else:
-                failed_count += 1
-        
-        # Update progress every 50 users
-        if idx % 50 == 0:
-            try:
-                url = f"{TELEGRAM_API_URL}/editMessageText"
-                payload = {
-                    'chat_id': chat_id,
-                    'message_id': progress_msg['result']['message_id'],
-                    'text': (
-                        f"📤 **Broadcasting...**\n\n"
-                        f"📊 Progress: {idx:,}/{total_users:,}\n"
-                        f"✅ Sent: {success_count:,}\n"
-                        f"❌ Failed: {failed_count + blocked_count:,}\n"
-                        f"⏱️ Remaining: ~{int((total_users - idx) * 0.05 / 60)} min"
-                    ),
-                    'parse_mode': 'Markdown'
-                }
-                requests.post(url, json=payload, timeout=10)
-            except:
-                pass
-        
-        # Rate limiting
-        import time
-        time.sleep(0.05)
-    
-    # Final report
-    user_states.pop(user_id, None)
+    if not progress_msg or not progress_msg.get('ok'):
+        logger.error(f"Could not post broadcast progress message: {progress_msg}")
+        return
     
-    url = f"{TELEGRAM_API_URL}/editMessageText"
-    payload = {
-        'chat_id': chat_id,
-        'message_id': progress_msg['result']['message_id'],
-        'text': (
-            f"✅ **Broadcast Complete!**\n\n"
-            f"📊 **Statistics:**\n"
-            f"👥 Total Users: {total_users:,}\n"
-            f"✅ Successfully Sent: {success_count:,}\n"
-            f"🚫 Blocked Bot: {blocked_count:,}\n"
-            f"❌ Failed: {failed_count:,}\n\n"
-            f"📈 Success Rate: {(success_count/max(total_users,1)*100):.1f}%"
-        ),
-        'parse_mode': 'Markdown'
-    }
-    requests.post(url, json=payload, timeout=10)
+    # Copy message to all users in the background
+    if not broadcast_engine.start(chat_id, message['message_id'], progress_msg['result']['message_id'], users):
+        send_message(chat_id, "⚠️ A broadcast is already running. Send /stopbroadcast to stop it first.")
 
 
 def handle_media(message):
@@ -1035,7 +1403,7 @@ def cmd_broadcast(message):
     user_id = message['from']['id']
     chat_id = message['chat']['id']
     
-    user_states[user_id] = 'broadcast_waiting'
+    state_store.update(user_id, state='broadcast_waiting')
     user_count = get_user_count()
     
     send_message(
@@ -1072,12 +1440,15 @@ def cmd_get_userlist(message):
     user_id = message['from']['id']
     chat_id = message['chat']['id']
     
-    user_file = Path('userid.json')
-    if user_file.exists():
-        user_count = get_user_count()
-        send_document(chat_id, str(user_file), f"📋 User Database\n👥 Total Users: **{user_count:,}**")
-    else:
+    try:
+        user_file = export_user_db()
+    except Exception as e:
+        logger.error(f"Error exporting user database: {e}")
         send_message(chat_id, "❌ User database file not found.")
+        return
+    
+    user_count = get_user_count()
+    send_document(chat_id, str(user_file), f"📋 User Database\n👥 Total Users: **{user_count:,}**")
 
 
 def cmd_stop_broadcast(message):
@@ -1085,24 +1456,48 @@ def cmd_stop_broadcast(message):
     user_id = message['from']['id']
     chat_id = message['chat']['id']
     
-    if user_states.get(user_id) == 'broadcast_waiting':
-        user_states.pop(user_id, None)
+    if state_store.get(user_id).get('state') == 'broadcast_waiting':
+        state_store.update(user_id, state=None)
         send_message(chat_id, "❌ Broadcast cancelled.")
+    elif broadcast_engine.cancel():
+        send_message(chat_id, "🛑 Stopping broadcast...")
     else:
         send_message(chat_id, "ℹ️ No broadcast is currently running.")
 
 
+def cmd_profile(message):
+    """Handle /profile [seconds]: sample all threads and send the collapsed stacks as a file."""
+    chat_id = message['chat']['id']
+    parts = message['text'].split()
+    try:
+        seconds = int(parts[1]) if len(parts) > 1 else 30
+    except ValueError:
+        send_message(chat_id, "Usage: /profile [seconds]")
+        return
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    
+    def run():
+        try:
+            stacks = profiler.profile(seconds)
+        except ProfilerBusyError:
+            send_message(chat_id, "⚠️ A profile is already running.")
+            return
+        filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}-pid{os.getpid()}.txt"
+        send_document_data(chat_id, filename, stacks.encode('utf-8'), f"🔥 {seconds}s profile (collapsed stacks for flamegraph.pl / speedscope)")
+    
+    threading.Thread(target=run, name='profiler', daemon=True).start()
+    send_message(chat_id, f"🔬 Profiling all threads for {seconds}s...")
+
+
 @app.route('/setwebhook', methods=['GET', 'POST'])
 def set_webhook():
     """Set webhook URL."""
     webhook_url = request.args.get('url') or WEBHOOK_URL
     
-    url = f"{TELEGRAM_API_URL}/setWebhook"
     payload = {'url': webhook_url}
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        result = response.json()
+        result = telegram.call('setWebhook', payload)
         
         if result.get('ok'):
             return jsonify({
@@ -1126,11 +1521,9 @@ def set_webhook():
 def set_webhook_auto():
     """Automatically set webhook using configured WEBHOOK_URL."""
     try:
-        url = f"{TELEGRAM_API_URL}/setWebhook"
         payload = {'url': WEBHOOK_URL}
         
-        response = requests.post(url, json=payload, timeout=10)
-        result = response.json()
+        result = telegram.call('setWebhook', payload)
         
         if result.get('ok'):
             return jsonify({
@@ -1153,11 +1546,8 @@ def set_webhook_auto():
 @app.route('/webhookinfo', methods=['GET', 'POST'])
 def webhook_info():
     """Get webhook info."""
-    url = f"{TELEGRAM_API_URL}/getWebhookInfo"
-    
     try:
-        response = requests.get(url, timeout=10)
-        result = response.json()
+        result = telegram.call('getWebhookInfo')
         
         # Return formatted info
         if result.get('ok'):
@@ -1184,10 +1574,8 @@ if __name__ == '__main__':
     
     # Auto-set webhook on startup
     try:
-        url = f"{TELEGRAM_API_URL}/setWebhook"
         payload = {'url': WEBHOOK_URL}
-        response = requests.post(url, json=payload, timeout=10)
-        result = response.json()
+        result = telegram.call('setWebhook', payload)
         if result.get('ok'):
             logger.info(f"✅ Webhook automatically set to: {WEBHOOK_URL}")
         else:
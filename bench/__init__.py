@@ -0,0 +1,3 @@
+"""
+Offline benchmark harness - fake Edge TTS and Bot API servers plus a load driver
+"""
@@ -0,0 +1,135 @@
+"""
+Fake Edge TTS WebSocket server - speaks enough of the protocol for edge_tts
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+import uuid
+
+from aiohttp import web
+
+from .server_thread import ServerThread
+
+# One MPEG-2 Layer III frame header (24 kHz, 48 kbit/s, mono) as Edge sends it;
+# the payload is silence-like filler, which is all the bot's MP3 handling looks at
+_FRAME_HEADER = b'\xff\xf3\x64\xc4'
+_FRAME_SIZE = 144
+
+
+def _fake_mp3(size):
+    frame = _FRAME_HEADER + b'\x00' * (_FRAME_SIZE - len(_FRAME_HEADER))
+    return (frame * (size // _FRAME_SIZE + 1))[:size]
+
+
+def _text_message(request_id, path, body='{}'):
+    return (
+        f"X-RequestId:{request_id}\r\n"
+        f"Content-Type:application/json; charset=utf-8\r\n"
+        f"Path:{path}\r\n\r\n{body}"
+    )
+
+
+def _audio_message(request_id, data):
+    header = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n".encode()
+    return len(header).to_bytes(2, 'big') + header + data
+
+
+class FakeEdgeServer:
+    """
+    Answers Edge TTS synthesis requests with fake MP3 audio.
+
+    Args:
+        latency: Seconds before the first audio chunk (time to first byte)
+        error_rate: Fraction of connections rejected with HTTP 403
+        bytes_per_char: Audio size per character of SSML text
+        chunk_bytes: Size of each binary audio message
+        chunk_interval: Seconds between audio messages
+    """
+
+    def __init__(self, latency=0.3, error_rate=0.0, bytes_per_char=60, chunk_bytes=4096, chunk_interval=0.01):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bytes_per_char = bytes_per_char
+        self.chunk_bytes = chunk_bytes
+        self.chunk_interval = chunk_interval
+        self.connections = 0
+        self.rejected = 0
+        self.syntheses = 0
+        self.active = 0
+        self.max_active = 0
+
+        self.app = web.Application()
+        self.app.router.add_get('/edge/v1', self.handle)
+        self._server = None
+
+    async def handle(self, request):
+        self.connections += 1
+        if random.random() < self.error_rate:
+            self.rejected += 1
+            return web.Response(status=403, text='Forbidden')
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            async for msg in ws:
+                if msg.type != web.WSMsgType.TEXT or 'Path:ssml' not in msg.data:
+                    continue
+                request_id = uuid.uuid4().hex
+                text = re.sub(r'<[^>]+>', '', msg.data.split('\r\n\r\n', 1)[-1])
+                audio = _fake_mp3(max(_FRAME_SIZE, len(text.strip()) * self.bytes_per_char))
+
+                await ws.send_str(_text_message(request_id, 'turn.start'))
+                await asyncio.sleep(self.latency)
+                for start in range(0, len(audio), self.chunk_bytes):
+                    await ws.send_bytes(_audio_message(request_id, audio[start:start + self.chunk_bytes]))
+                    if self.chunk_interval:
+                        await asyncio.sleep(self.chunk_interval)
+                await ws.send_str(_text_message(request_id, 'turn.end'))
+                self.syntheses += 1
+        finally:
+            self.active -= 1
+        return ws
+
+    def start(self, port=0):
+        """Serve from a background thread; returns the URL to use as EDGE_TTS_WSS_URL."""
+        self._server = ServerThread(self.app, port)
+        port = self._server.start()
+        return f"ws://127.0.0.1:{port}/edge/v1?TrustedClientToken=bench"
+
+    def stop(self):
+        if self._server:
+            self._server.stop()
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "rejected_403": self.rejected,
+            "syntheses": self.syntheses,
+            "max_concurrent": self.max_active,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Edge TTS server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--bytes-per-char', type=int, default=60)
+    args = parser.parse_args()
+
+    server = FakeEdgeServer(latency=args.latency, error_rate=args.error_rate, bytes_per_char=args.bytes_per_char)
+    print(f"EDGE_TTS_WSS_URL={server.start(args.port)}")
+    try:
+        while True:
+            time.sleep(60)
+            print(server.stats())
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
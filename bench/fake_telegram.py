@@ -0,0 +1,115 @@
+"""
+Fake Telegram Bot API server - records calls and keyboards for the benchmark driver
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from .server_thread import ServerThread
+
+
+class FakeTelegramServer:
+    """
+    Accepts any /bot<token>/<method> call and answers like the Bot API.
+
+    Every chat's last inline keyboard is kept so the driver can press its
+    buttons, and sendAudio deliveries are timestamped per chat so the
+    driver can measure end-to-end TTS latency.
+    """
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1000)
+        self._file_ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._keyboards = {}   # chat_id -> (message_id, reply_markup dict)
+        self._audio = {}       # chat_id -> list of delivery times
+
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+        self.app.router.add_get('/bot{token}/{method}', self.handle)
+        self._server = None
+
+    async def _payload(self, request):
+        if request.content_type == 'application/json':
+            return await request.json()
+        form = await request.post()
+        return {key: value for key, value in form.items()}
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        payload = await self._payload(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        chat_id = payload.get('chat_id')
+        chat_id = int(chat_id) if chat_id not in (None, '') else None
+        message_id = int(payload.get('message_id') or next(self._message_ids))
+        message = {"message_id": message_id, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+
+        with self._cond:
+            self.calls[method] += 1
+            markup = payload.get('reply_markup')
+            if markup and chat_id is not None:
+                if isinstance(markup, str):
+                    markup = json.loads(markup)
+                self._keyboards[chat_id] = (message_id, markup)
+            if method == 'sendAudio' and chat_id is not None:
+                self._audio.setdefault(chat_id, []).append(time.monotonic())
+                self._cond.notify_all()
+
+        if method == 'getChatMember':
+            result = {"status": "member", "user": {"id": int(payload.get('user_id', 0))}}
+        elif method == 'sendAudio':
+            audio = payload.get('audio')
+            file_id = audio if isinstance(audio, str) else f"bench-audio-{next(self._file_ids)}"
+            result = {**message, "audio": {"file_id": file_id, "file_unique_id": file_id}}
+        elif method in ('answerCallbackQuery', 'setWebhook', 'deleteWebhook'):
+            result = True
+        elif method == 'getWebhookInfo':
+            result = {"url": "", "pending_update_count": 0}
+        elif method == 'copyMessage':
+            result = {"message_id": next(self._message_ids)}
+        else:
+            result = message
+        return web.json_response({"ok": True, "result": result})
+
+    def keyboard(self, chat_id):
+        """(message_id, reply_markup) of the last keyboard sent to a chat, or None."""
+        with self._cond:
+            return self._keyboards.get(chat_id)
+
+    def audio_count(self, chat_id):
+        with self._cond:
+            return len(self._audio.get(chat_id, []))
+
+    def wait_for_audio(self, chat_id, count, timeout):
+        """Block until the chat has received `count` audios; returns the delivery time or None."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self._audio.get(chat_id, [])) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._audio[chat_id][count - 1]
+
+    def total_calls(self):
+        with self._cond:
+            return sum(self.calls.values())
+
+    def start(self, port=0):
+        """Serve from a background thread; returns the URL to use as TELEGRAM_API_BASE."""
+        self._server = ServerThread(self.app, port)
+        port = self._server.start()
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self):
+        if self._server:
+            self._server.stop()
@@ -0,0 +1,114 @@
+"""
+Replay recorded webhook updates against a running app
+
+Plays back a log written with WEBHOOK_RECORD_PATH, preserving the
+original inter-arrival times (optionally sped up) or at a fixed rate:
+
+    python -m bench.replay updates.jsonl --url http://127.0.0.1:5000            # real time
+    python -m bench.replay updates.jsonl --url http://127.0.0.1:5000 --speed 10 # 10x faster
+    python -m bench.replay updates.jsonl --url http://127.0.0.1:5000 --max-rate # as fast as possible
+    python -m bench.replay updates.jsonl --url http://127.0.0.1:5000 --rate 50  # 50 updates/s
+
+Point the app at the fake Bot API (bench/fake_telegram.py) unless the
+replayed users should really receive messages.
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .run_bench import percentile
+
+
+def load_updates(path):
+    """Return [(ts, update)] sorted by timestamp."""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'update' in record:
+                records.append((float(record.get('ts', 0)), record['update']))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def schedule(records, speed=1.0, rate=None):
+    """Offsets (seconds from start) at which each update is sent."""
+    if rate:
+        return [i / rate for i in range(len(records))]
+    if speed is None:
+        return [0.0] * len(records)
+    first = records[0][0] if records else 0.0
+    return [(ts - first) / speed for ts, _ in records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded webhook updates')
+    parser.add_argument('log', help='JSON lines file written with WEBHOOK_RECORD_PATH')
+    parser.add_argument('--url', required=True, help='app base URL (updates go to <url>/webhook)')
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument('--speed', type=float, default=1.0, help='time compression factor (1 = real time)')
+    pacing.add_argument('--rate', type=float, help='fixed rate in updates/second, ignoring timestamps')
+    pacing.add_argument('--max-rate', action='store_true', help='send as fast as the concurrency allows')
+    parser.add_argument('--concurrency', type=int, default=32, help='maximum updates in flight')
+    parser.add_argument('--limit', type=int, help='replay only the first N updates')
+    args = parser.parse_args()
+
+    records = load_updates(args.log)[:args.limit]
+    if not records:
+        print("No updates to replay")
+        return
+    offsets = schedule(records, speed=None if args.max_rate else args.speed, rate=args.rate)
+    print(f"Replaying {len(records)} updates over {offsets[-1]:.1f}s to {args.url}/webhook")
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=args.concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    lock = threading.Lock()
+    latencies, lags = [], []
+    errors = 0
+
+    def send(update, due):
+        nonlocal errors
+        sent = time.monotonic()
+        try:
+            ok = session.post(f"{args.url}/webhook", json=update, timeout=60).status_code == 200
+        except requests.RequestException:
+            ok = False
+        with lock:
+            latencies.append(time.monotonic() - sent)
+            lags.append(max(0.0, sent - due))
+            if not ok:
+                errors += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for (_, update), offset in zip(records, offsets):
+            due = started + offset
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, update, due)
+    wall = time.monotonic() - started
+
+    print(f"Sent {len(latencies)} updates in {wall:.1f}s ({len(latencies) / wall:.1f}/s), {errors} errors")
+    print(f"Webhook latency ms: p50={percentile(latencies, 50) * 1000:.1f} "
+          f"p95={percentile(latencies, 95) * 1000:.1f} p99={percentile(latencies, 99) * 1000:.1f} "
+          f"max={max(latencies) * 1000:.1f}")
+    print(f"Schedule lag ms: p50={percentile(lags, 50) * 1000:.1f} p99={percentile(lags, 99) * 1000:.1f} "
+          f"(time updates were sent later than due, e.g. because all {args.concurrency} slots were busy)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Benchmark driver - loads /webhook and /tts against fake Edge TTS and Bot API servers
+
+Runs entirely offline:
+
+    python -m bench.run_bench --users 50 --messages 3 --web-requests 200 --concurrency 16
+
+By default the app is started with gunicorn (as in the Procfile) in a
+temporary directory, so userid.json, caches and state files of the
+checkout are not touched. Use --app-url to target an app you started
+yourself with TELEGRAM_API_BASE / EDGE_TTS_WSS_URL pointing at the
+fake servers (fixed with --telegram-port / --edge-port).
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from .fake_edge import FakeEdgeServer
+from .fake_telegram import FakeTelegramServer
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+SHARED_TEXTS = [
+    "Hello and welcome to the show.",
+    "The quick brown fox jumps over the lazy dog.",
+    "Please remember to subscribe to our channel for more updates.",
+    "Good morning! Today's weather is sunny with a light breeze.",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(name, latencies, errors, wall_time):
+    """One result row: latency percentiles in ms and throughput."""
+    return {
+        "name": name,
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+        "throughput_rps": round(len(latencies) / wall_time, 1) if wall_time else 0.0,
+    }
+
+
+class Recorder:
+    """Thread-safe latency/error collection per request kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, kind, seconds, ok=True):
+        with self._lock:
+            self.latencies.setdefault(kind, []).append(seconds)
+            if not ok:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def pick_text(user_id, index, repeat_ratio):
+    if random.random() < repeat_ratio:
+        return random.choice(SHARED_TEXTS)
+    return f"Message number {index} from benchmark user {user_id}. " * 3
+
+
+class BotDriver:
+    """Simulates bot users: /start, pick a voice from the keyboards, then send texts."""
+
+    def __init__(self, app_url, telegram, recorder, audio_timeout):
+        self.webhook_url = f"{app_url}/webhook"
+        self.telegram = telegram
+        self.recorder = recorder
+        self.audio_timeout = audio_timeout
+        self.session = requests.Session()
+        self._update_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def post(self, kind, update):
+        with self._lock:
+            update['update_id'] = next(self._update_ids)
+            self.updates += 1
+        started = time.monotonic()
+        try:
+            ok = self.session.post(self.webhook_url, json=update, timeout=60).status_code == 200
+        except requests.RequestException:
+            ok = False
+        self.recorder.add(f"webhook:{kind}", time.monotonic() - started, ok)
+        return started
+
+    def message(self, user_id, text):
+        return {"message": {
+            "message_id": random.randint(1, 10 ** 6),
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "chat": {"id": user_id, "type": "private"},
+            "date": int(time.time()),
+            "text": text,
+        }}
+
+    def press_first_button(self, user_id, index):
+        keyboard = self.telegram.keyboard(user_id)
+        if not keyboard:
+            return False
+        message_id, markup = keyboard
+        rows = markup.get('inline_keyboard') or [[]]
+        if not rows[0] or 'callback_data' not in rows[0][0]:
+            return False
+        self.post('callback', {"callback_query": {
+            "id": f"{user_id}-{index}",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "message": {"message_id": message_id, "chat": {"id": user_id, "type": "private"}},
+            "data": rows[0][0]['callback_data'],
+        }})
+        return True
+
+    def run_user(self, user_id, messages, repeat_ratio):
+        self.post('start', self.message(user_id, '/start'))
+        # country -> language -> voice
+        for step in range(3):
+            if not self.press_first_button(user_id, step):
+                return
+        received = self.telegram.audio_count(user_id)
+        for index in range(messages):
+            started = self.post('text', self.message(user_id, pick_text(user_id, index, repeat_ratio)))
+            delivered = self.telegram.wait_for_audio(user_id, received + index + 1, self.audio_timeout)
+            if delivered is None:
+                self.recorder.add('bot:text_to_audio', self.audio_timeout, ok=False)
+            else:
+                self.recorder.add('bot:text_to_audio', delivered - started)
+
+
+def run_web(app_url, requests_count, concurrency, repeat_ratio, voice, recorder):
+    session = requests.Session()
+
+    def one(index):
+        text = pick_text(0, index, repeat_ratio)
+        started = time.monotonic()
+        try:
+            response = session.post(f"{app_url}/tts", json={"text": text, "voice": voice}, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        recorder.add('web:tts', time.monotonic() - started, ok)
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(edge_url, telegram_url, workers, threads):
+    """Start the app under gunicorn in a scratch directory; returns (process, url, workdir)."""
+    workdir = Path(tempfile.mkdtemp(prefix='ttsbot-bench-'))
+    shutil.copy(REPO_DIR / 'voice.json', workdir / 'voice.json')
+    port = free_port()
+    env = {
+        **os.environ,
+        'PYTHONPATH': str(REPO_DIR),
+        'TELEGRAM_API_BASE': telegram_url,
+        'EDGE_TTS_WSS_URL': edge_url,
+        'TELEGRAM_BOT_TOKEN': '123456:BENCH',
+        'OWNER_ID': '1',
+    }
+    env.pop('DYNO', None)
+    log = open(workdir / 'app.log', 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads), '--timeout', '120'],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited during startup, see {workdir / 'app.log'}")
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url, workdir
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"App did not become healthy, see {workdir / 'app.log'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline throughput/latency benchmark')
+    parser.add_argument('--users', type=int, default=20, help='simulated bot users')
+    parser.add_argument('--messages', type=int, default=3, help='texts sent per bot user')
+    parser.add_argument('--web-requests', type=int, default=100, help='POST /tts requests')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--repeat-ratio', type=float, default=0.3, help='fraction of texts drawn from a small shared pool')
+    parser.add_argument('--voice', default='en-US-AriaNeural', help='voice for web requests')
+    parser.add_argument('--edge-latency', type=float, default=0.3, help='fake Edge time to first audio (s)')
+    parser.add_argument('--edge-403-rate', type=float, default=0.0, help='fraction of Edge connections rejected with 403')
+    parser.add_argument('--edge-bytes-per-char', type=int, default=60)
+    parser.add_argument('--telegram-latency', type=float, default=0.02, help='fake Bot API latency (s)')
+    parser.add_argument('--edge-port', type=int, default=0)
+    parser.add_argument('--telegram-port', type=int, default=0)
+    parser.add_argument('--app-url', help='benchmark an already running app instead of starting one')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--audio-timeout', type=float, default=60.0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    edge = FakeEdgeServer(latency=args.edge_latency, error_rate=args.edge_403_rate, bytes_per_char=args.edge_bytes_per_char)
+    telegram = FakeTelegramServer(latency=args.telegram_latency)
+    edge_url = edge.start(args.edge_port)
+    telegram_url = telegram.start(args.telegram_port)
+    print(f"Fake Edge TTS:    {edge_url}")
+    print(f"Fake Bot API:     {telegram_url}")
+
+    process = None
+    app_url = args.app_url
+    if not app_url:
+        process, app_url, workdir = start_app(edge_url, telegram_url, args.workers, args.threads)
+        print(f"App:              {app_url} (workdir {workdir})")
+
+    recorder = Recorder()
+    results = []
+    try:
+        bot = BotDriver(app_url, telegram, recorder, args.audio_timeout)
+        calls_before = telegram.total_calls()
+        started = time.monotonic()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(
+                lambda user_id: bot.run_user(user_id, args.messages, args.repeat_ratio),
+                range(100001, 100001 + args.users)
+            ))
+        bot_wall = time.monotonic() - started
+        bot_calls = telegram.total_calls() - calls_before
+
+        started = time.monotonic()
+        run_web(app_url, args.web_requests, args.concurrency, args.repeat_ratio, args.voice, recorder)
+        web_wall = time.monotonic() - started
+
+        for kind in sorted(recorder.latencies):
+            wall = web_wall if kind.startswith('web:') else bot_wall
+            results.append(summarize(kind, recorder.latencies[kind], recorder.errors.get(kind, 0), wall))
+
+        try:
+            app_status = requests.get(f"{app_url}/status", timeout=5).json()
+        except (requests.RequestException, ValueError):
+            app_status = None
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        edge.stop()
+        telegram.stop()
+
+    print()
+    print(f"{'kind':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'req/s':>9}")
+    for row in results:
+        print(f"{row['name']:<22}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['max_ms']:>10}{row['throughput_rps']:>9}")
+    calls_per_update = round(bot_calls / bot.updates, 2) if bot.updates else 0.0
+    print()
+    print(f"Bot updates: {bot.updates}, Telegram calls: {bot_calls} ({calls_per_update} per update)")
+    print(f"Telegram calls by method: {dict(telegram.calls)}")
+    print(f"Fake Edge: {edge.stats()}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "args": vars(args),
+            "results": results,
+            "telegram_calls_per_update": calls_per_update,
+            "telegram_calls": dict(telegram.calls),
+            "edge": edge.stats(),
+            "app_status": app_status,
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Run an aiohttp web application on a background event loop thread
+"""
+import asyncio
+import threading
+
+from aiohttp import web
+
+
+class ServerThread:
+    """Serves an aiohttp Application on 127.0.0.1 from a daemon thread."""
+
+    def __init__(self, app, port=0):
+        self.app = app
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self._runner = None
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        """Start serving and return the bound port."""
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self.port
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,139 @@
+"""
+Append log - snapshot plus append-only journal shared by worker processes
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+
+# First line of a compacted journal; journals without it are generation 0
+_HEADER_PREFIX = b'# generation '
+
+
+class AppendLog:
+    """
+    Persistence for an in-memory store: a snapshot file plus an append-only
+    journal with one record per line, shared by several processes.
+
+    The owner keeps the state and hands in two callbacks: load(data) resets
+    it from the snapshot bytes (None when there is no snapshot) and
+    apply(line) applies one journal record. refresh() replays the records
+    other processes appended since the last call, reading from the last
+    offset. Writers serialize on an flock()ed lock file via lock().
+
+    compact() replaces the snapshot and then swaps in an empty journal whose
+    header line carries the next generation number. Readers notice a
+    compaction by that number changing, not by the journal's inode, which
+    the file system may reuse, and reload under a shared lock so they never
+    see a half-finished compaction.
+
+    Not thread-safe; owners call it under their own lock.
+    """
+
+    def __init__(self, snapshot_path, journal_path, lock_path, load, apply):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.lock_path = lock_path
+        self._load = load
+        self._apply = apply
+        self.generation = None  # of the journal we have read; None before the first load
+        self.entries = 0  # journal records applied since the snapshot
+        self._offset = 0
+        self._locked = False
+
+    @contextmanager
+    def lock(self, shared=False):
+        """Hold the file lock (exclusive for writers) unless this store already does."""
+        if self._locked:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._locked = True
+            try:
+                yield
+            finally:
+                self._locked = False
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_header(f):
+        """Return (generation, offset of the first record) of an open journal."""
+        head = f.read(64)
+        if head.startswith(_HEADER_PREFIX) and b'\n' in head:
+            end = head.index(b'\n')
+            return int(head[len(_HEADER_PREFIX):end]), end + 1
+        return 0, 0
+
+    def refresh(self):
+        """Bring the owner's state up to date (one open() and read() when unchanged)."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                generation, start = self._read_header(f)
+                if generation != self.generation or os.fstat(f.fileno()).st_size < self._offset:
+                    # First load, or another process compacted
+                    self._reload()
+                    return
+                f.seek(max(self._offset, start))
+                chunk = f.read()
+        except FileNotFoundError:
+            if self.generation != 0 or self._offset:
+                self._reload()
+            return
+        self._consume(chunk)
+
+    def _reload(self):
+        with self.lock(shared=True):
+            try:
+                snapshot = self.snapshot_path.read_bytes()
+            except FileNotFoundError:
+                snapshot = None
+            self._load(snapshot)
+            self.entries = 0
+            try:
+                with open(self.journal_path, 'rb') as f:
+                    self.generation, self._offset = self._read_header(f)
+                    f.seek(self._offset)
+                    chunk = f.read()
+            except FileNotFoundError:
+                self.generation, self._offset, chunk = 0, 0, b''
+            self._consume(chunk)
+
+    def _consume(self, chunk):
+        # Only consume complete lines
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].split(b'\n'):
+            if line.strip():
+                self._apply(line)
+                self.entries += 1
+        self._offset += end
+
+    def append(self, line, fsync=False):
+        """Append one record (bytes without newline); call under lock() after refresh()."""
+        with open(self.journal_path, 'ab') as f:
+            f.write(line + b'\n')
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.refresh()
+
+    def compact(self, snapshot):
+        """
+        Replace the snapshot with the given bytes, the owner's up-to-date
+        state, and start an empty journal; call under lock() after refresh().
+        """
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        generation = (self.generation or 0) + 1
+        header = _HEADER_PREFIX + str(generation).encode() + b'\n'
+        tmp_journal = self.journal_path.with_name(self.journal_path.name + '.tmp')
+        with open(tmp_journal, 'wb') as f:
+            f.write(header)
+        os.replace(tmp_journal, self.journal_path)
+        self.generation = generation
+        self._offset = len(header)
+        self.entries = 0
@@ -0,0 +1,95 @@
+"""
+Long-lived asyncio runtime - one event loop thread per process for Edge TTS
+"""
+import asyncio
+import logging
+import os
+import threading
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class SharedConnector(aiohttp.TCPConnector):
+    """
+    TCPConnector that outlives the ClientSession using it.
+
+    edge_tts opens and closes its own ClientSession per request, and a
+    session closes the connector it was given. Ignoring close() keeps the
+    DNS cache and SSL setup alive across requests; shutdown() really closes.
+    """
+
+    def close(self, *args, **kwargs):
+        done = asyncio.get_running_loop().create_future()
+        done.set_result(None)
+        return done
+
+    def shutdown(self):
+        return super().close()
+
+
+class AsyncRuntime:
+    """
+    Runs coroutines for synchronous Flask/worker threads on a single
+    background event loop, started lazily (and again after a fork).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._connector = None
+        self._submitted = 0
+        self._in_flight = 0
+
+    def _ensure_loop(self):
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=f"{self.name}-loop", daemon=True)
+                thread.start()
+                self._loop, self._thread, self._pid = loop, thread, os.getpid()
+                self._connector = None
+                logger.info(f"Started '{self.name}' event loop thread")
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop and return a concurrent.futures.Future."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        with self._lock:
+            self._submitted += 1
+            self._in_flight += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and block until it finishes (cancelled on timeout)."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def _on_done(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def connector(self):
+        """Shared connector for aiohttp sessions; call from coroutines on this loop."""
+        if self._connector is None or self._connector.closed:
+            self._connector = SharedConnector(ttl_dns_cache=300, limit=100)
+        return self._connector
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+                "submitted": self._submitted,
+                "in_flight": self._in_flight,
+            }
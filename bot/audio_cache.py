@@ -0,0 +1,252 @@
+"""
+Content-addressed cache for synthesized audio (memory + disk tiers)
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from .metrics import AUDIO_CACHE_LOOKUPS, FILE_IO_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# A cache_key() digest, i.e. the stem of a cache file name
+CACHE_KEY_RE = re.compile(r'[0-9a-f]{64}')
+
+# Memory hits refresh the file's mtime, which the reaper expires on, at most this often (seconds)
+TOUCH_INTERVAL = 60
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different inputs share a cache entry."""
+    return ' '.join(text.split())
+
+
+def cache_key(voice, text):
+    """Return the hex digest identifying audio for (voice, normalized text)."""
+    payload = f"{voice}\n{normalize_text(text)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class AudioCache:
+    """
+    Two-tier LRU cache of MP3 bytes keyed by cache_key().
+
+    The memory tier holds recently used audio up to memory_budget bytes.
+    The disk tier stores one <key>.mp3 per entry in cache_dir up to
+    disk_budget bytes; files survive restarts and are shared by every
+    worker process on the dyno.
+
+    With a reaper, written files are tracked for expiry and evicted files
+    are deleted in its background batches instead of on the request path.
+    Hits touch the file so that audio in use does not expire.
+    """
+
+    def __init__(self, cache_dir, memory_budget, disk_budget, reaper=None):
+        self.cache_dir = Path(cache_dir)
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.reaper = reaper
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size in bytes
+        self._disk_bytes = 0
+        self._touched = {}  # key -> time.monotonic() of the last utime
+
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._bytes_saved = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from file modification times."""
+        entries = []
+        for file in self.cache_dir.glob('*.mp3'):
+            try:
+                st = file.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, file.stem, st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        if entries:
+            logger.info(f"Audio cache: indexed {len(entries)} files ({self._disk_bytes} bytes) in {self.cache_dir}")
+        self._evict_disk()
+
+    def path(self, key):
+        """Disk location for a cache entry (may not exist)."""
+        return self.cache_dir / f"{key}.mp3"
+
+    def get(self, key):
+        """Return cached audio bytes or None, promoting disk hits into memory."""
+        with self._lock:
+            data = self._memory.get(key)
+            touch = False
+            if data is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self._hits_memory += 1
+                self._bytes_saved += len(data)
+                AUDIO_CACHE_LOOKUPS.inc('memory')
+                now = time.monotonic()
+                touch = key not in self._touched or now - self._touched[key] >= TOUCH_INTERVAL
+                if touch:
+                    self._touched[key] = now
+        if data is not None:
+            if touch:
+                self._touch(key)
+            return data
+
+        path = self.path(key)
+        try:
+            with FILE_IO_SECONDS.time('audio_cache_read'):
+                data = path.read_bytes()
+        except OSError:
+            data = None
+
+        with self._lock:
+            if not data:
+                self._misses += 1
+                AUDIO_CACHE_LOOKUPS.inc('miss')
+                return None
+            if key not in self._disk:
+                # Written by another worker process
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+            self._disk.move_to_end(key)
+            self._hits_disk += 1
+            self._bytes_saved += len(data)
+            AUDIO_CACHE_LOOKUPS.inc('disk')
+            self._store_memory(key, data)
+            self._touched[key] = time.monotonic()
+
+        self._touch(key)
+        return data
+
+    def _touch(self, key):
+        """Bump the file's mtime: keeps disk LRU order across restarts and postpones its expiry."""
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def ensure_file(self, key):
+        """
+        Return the path of a cached entry's file, or None on a miss.
+
+        A memory hit whose file was deleted meanwhile (e.g. by the reaper of
+        another worker process) is written back to disk first, so the path
+        can be handed out as a URL or uploaded.
+        """
+        data = self.get(key)
+        if data is None:
+            return None
+        path = self.path(key)
+        if not path.exists():
+            logger.info(f"Audio cache: restoring deleted file {path.name} from memory")
+            self.put(key, data)
+        return path
+
+    def put_file(self, key, src_path):
+        """Move a freshly synthesized file into the cache and return its cache path."""
+        src_path = Path(src_path)
+        dest = self.path(key)
+        with FILE_IO_SECONDS.time('audio_cache_write'):
+            data = src_path.read_bytes()
+            os.replace(src_path, dest)
+        self._index(key, data)
+        if self.reaper:
+            self.reaper.track(dest, len(data))
+        return dest
+
+    def put(self, key, data):
+        """Store audio bytes in the cache and return its cache path."""
+        dest = self.path(key)
+        tmp_path = dest.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with FILE_IO_SECONDS.time('audio_cache_write'):
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, dest)
+        self._index(key, data)
+        if self.reaper:
+            self.reaper.track(dest, len(data))
+        return dest
+
+    def _index(self, key, data):
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._store_memory(key, data)
+            self._evict_disk()
+
+    def _store_memory(self, key, data):
+        if len(data) > self.memory_budget:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_budget and self._memory:
+            evicted_key, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._touched.pop(evicted_key, None)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_budget and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            evicted = self._memory.pop(key, None)
+            if evicted is not None:
+                self._memory_bytes -= len(evicted)
+            self._touched.pop(key, None)
+            if self.reaper:
+                self.reaper.delete_later(self.path(key))
+                continue
+            try:
+                self.path(key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error evicting cached audio {key}: {e}")
+
+    def forget(self, key):
+        """Drop an entry whose file was deleted outside the cache (e.g. by the reaper)."""
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+            data = self._memory.pop(key, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+            self._touched.pop(key, None)
+
+    def stats(self):
+        """Return hit ratio, bytes saved and tier occupancy."""
+        with self._lock:
+            hits = self._hits_memory + self._hits_disk
+            lookups = hits + self._misses
+            return {
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+                "bytes_saved": self._bytes_saved,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_budget": self.memory_budget,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_budget": self.disk_budget,
+            }
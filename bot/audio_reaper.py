@@ -0,0 +1,211 @@
+"""
+Audio reaper - background expiry and disk quota for generated audio files
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from .metrics import AUDIO_REAPED
+
+logger = logging.getLogger(__name__)
+
+# Files the reaper owns; anything else under the audio directory is left alone
+REAPED_SUFFIXES = ('.mp3', '.part', '.tmp')
+
+
+class AudioReaper:
+    """
+    Deletes audio files under root once they are `expiry` seconds past
+    their last modification, and the oldest files first whenever the
+    tracked total exceeds `quota` bytes.
+
+    Writers report new files with track() and hand over files they want
+    gone with delete_later(); both are O(log n) and never touch the disk.
+    A queued file is spared if it is tracked again (re-written) or its
+    mtime moves past the time it was queued (re-used, maybe by another
+    worker process) before the batch runs.
+    Expiries live in a min-heap: a popped entry is stat()ed once, and if
+    the file was touched since (e.g. os.utime on a cache hit) it is pushed
+    back with its new expiry instead of being deleted.
+
+    The thread starts lazily on first use so that importing the app does
+    not spawn threads. Its first pass indexes files left by earlier
+    processes, which is the only directory scan the reaper ever does.
+    """
+
+    def __init__(self, root, expiry, quota, interval=30, batch_size=200, on_delete=None):
+        self.root = Path(root)
+        self.expiry = expiry
+        self.quota = quota
+        self.interval = interval
+        self.batch_size = batch_size
+        self.on_delete = on_delete  # called with the Path of every reaped file
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._heap = []  # (expires_at, path)
+        self._sizes = {}  # path -> size in bytes
+        self._bytes = 0
+        self._pending = {}  # path -> time.time() it was handed over with delete_later()
+        self._thread = None
+
+        self._deleted = {"expired": 0, "quota": 0, "evicted": 0}
+        self._deleted_bytes = 0
+        self._passes = 0
+
+    def start(self):
+        """Start the reaper thread if it is not running yet."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='audio-reaper', daemon=True)
+            self._thread.start()
+        logger.info(f"Audio reaper started for {self.root} (expiry {self.expiry}s, quota {self.quota} bytes)")
+
+    def track(self, path, size, mtime=None):
+        """Register a file that was just written."""
+        self.start()
+        path = str(path)
+        expires_at = (time.time() if mtime is None else mtime) + self.expiry
+        with self._lock:
+            self._pending.pop(path, None)
+            self._bytes += size - self._sizes.get(path, 0)
+            self._sizes[path] = size
+            heapq.heappush(self._heap, (expires_at, path))
+            over_quota = self._bytes > self.quota
+        if over_quota:
+            self._wake.set()
+
+    def delete_later(self, path):
+        """Queue a file for deletion in the next batch."""
+        self.start()
+        with self._lock:
+            self._pending[str(path)] = time.time()
+
+    def _run(self):
+        self._scan()
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"Audio reaper pass failed: {e}")
+
+    def _scan(self):
+        """Index audio files that already exist (e.g. from before a restart)."""
+        found = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(REAPED_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                with self._lock:
+                    if path in self._sizes:
+                        continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                self.track(path, st.st_size, st.st_mtime)
+                found += 1
+        logger.info(f"Audio reaper indexed {found} existing files ({self._bytes} bytes)")
+
+    def reap(self, now=None):
+        """Run one pass: queued deletions, expired files, then the quota. Returns the number deleted."""
+        now = time.time() if now is None else now
+        budget = self.batch_size
+        with self._lock:
+            pending = list(self._pending.items())[:budget]
+            for path, _ in pending:
+                del self._pending[path]
+        deleted = 0
+        for path, queued_at in pending:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                self._forget(path)
+                continue
+            if mtime >= queued_at:
+                continue  # written or touched since it was evicted; expiry handles it
+            deleted += self._delete(path, 'evicted')
+
+        # Expired files, then the oldest files while over quota. Entries whose
+        # file was touched since they were pushed are re-queued, at most once
+        # per heap entry per pass so a pass always terminates.
+        checks = len(self._heap)
+        while deleted < budget and checks > 0:
+            with self._lock:
+                if not self._heap:
+                    break
+                expires_at, path = self._heap[0]
+                if expires_at <= now:
+                    reason = 'expired'
+                elif self._bytes > self.quota:
+                    reason = 'quota'
+                else:
+                    break
+                heapq.heappop(self._heap)
+                if path not in self._sizes:
+                    continue  # already deleted, or a stale duplicate entry
+            checks -= 1
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                self._forget(path)
+                continue
+            if mtime + self.expiry > expires_at:
+                with self._lock:
+                    heapq.heappush(self._heap, (mtime + self.expiry, path))
+                continue
+            deleted += self._delete(path, reason)
+
+        with self._lock:
+            self._passes += 1
+            if self._pending or (self._heap and (self._heap[0][0] <= now or self._bytes > self.quota)):
+                self._wake.set()  # more work than one batch; go again without waiting
+        if deleted:
+            logger.info(f"Audio reaper deleted {deleted} files ({self._bytes} bytes tracked)")
+        return deleted
+
+    def _delete(self, path, reason):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            self._forget(path)
+            return 0
+        except OSError as e:
+            logger.error(f"Error deleting audio file {path}: {e}")
+            return 0
+        size = self._forget(path)
+        with self._lock:
+            self._deleted[reason] += 1
+            self._deleted_bytes += size
+        AUDIO_REAPED.inc(reason)
+        if self.on_delete:
+            try:
+                self.on_delete(Path(path))
+            except Exception as e:
+                logger.error(f"Audio reaper on_delete failed for {path}: {e}")
+        return 1
+
+    def _forget(self, path):
+        with self._lock:
+            size = self._sizes.pop(path, 0)
+            self._bytes -= size
+            return size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "tracked_files": len(self._sizes),
+                "tracked_bytes": self._bytes,
+                "quota_bytes": self.quota,
+                "pending_deletes": len(self._pending),
+                "deleted": dict(self._deleted),
+                "deleted_bytes": self._deleted_bytes,
+                "passes": self._passes,
+            }
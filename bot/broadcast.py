@@ -0,0 +1,307 @@
+"""
+Background broadcast engine - rate governed, resumable, cancellable
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .metrics import BROADCAST_SENDS
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; pause() stalls every caller (used for 429 retry_after)."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel_event=None):
+        """Block until a token is available. Returns False if cancelled while waiting."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    wait = (1 - self._tokens) / self.rate
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back all callers for at least `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+class BroadcastEngine:
+    """
+    Copies one message to every user from a background thread.
+
+    Sends run on a small thread pool under a global token bucket. Progress
+    is checkpointed to disk after each batch so a restarted process can
+    resume where the previous one stopped (a batch may be re-sent). A
+    lock file makes sure only one process on the dyno runs the broadcast;
+    any process can stop it by creating a cancel marker file, which the
+    running process checks between batches. The marker outlives a crash,
+    so a stopped broadcast is discarded instead of resumed; only start()
+    clears it.
+    """
+
+    def __init__(self, client, checkpoint_path, rate=25, concurrency=8, batch_size=50, skip_user_id=None):
+        self.client = client
+        self.checkpoint_path = Path(checkpoint_path)
+        self.lock_path = self.checkpoint_path.with_name(self.checkpoint_path.name + '.lock')
+        self.cancel_path = self.checkpoint_path.with_name(self.checkpoint_path.name + '.cancel')
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.skip_user_id = skip_user_id
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._lock_file = None
+        self._cancel = threading.Event()
+        self._state = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def active(self):
+        """True if a broadcast is running in this or another process on the dyno."""
+        if self.running:
+            return True
+        try:
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return False
+        except OSError:
+            return True
+
+    def start(self, chat_id, message_id, progress_message_id, users):
+        """
+        Begin broadcasting message_id from chat_id to users.
+        Returns False if a broadcast is already running on this dyno.
+        """
+        with self._lock:
+            if self.running or not self._acquire_run_lock():
+                return False
+            self.cancel_path.unlink(missing_ok=True)  # left over from a run that ended before seeing it
+            self._state = {
+                'chat_id': chat_id,
+                'message_id': message_id,
+                'progress_message_id': progress_message_id,
+                'users': [u for u in users if u != self.skip_user_id],
+                'next_index': 0,
+                'success': 0,
+                'blocked': 0,
+                'failed': 0,
+                'started_at': time.time(),
+            }
+            self._save_checkpoint()
+            self._launch()
+            return True
+
+    def resume(self):
+        """Resume an interrupted broadcast from its checkpoint, if there is one."""
+        with self._lock:
+            if self.running or not self.checkpoint_path.exists():
+                return False
+            if not self._acquire_run_lock():
+                return False
+            try:
+                with open(self.checkpoint_path, 'r') as f:
+                    self._state = json.load(f)
+            except Exception as e:
+                logger.error(f"Unreadable broadcast checkpoint, discarding: {e}")
+                self.checkpoint_path.unlink(missing_ok=True)
+                self._release_run_lock()
+                return False
+            if self.cancel_path.exists():
+                logger.info(f"Discarding broadcast stopped at {self._state['next_index']}/{len(self._state['users'])} before a restart")
+                self._edit_progress(self._final_text(cancelled=True))
+                self.checkpoint_path.unlink(missing_ok=True)
+                self.cancel_path.unlink(missing_ok=True)
+                self._release_run_lock()
+                return False
+            logger.info(f"Resuming broadcast at {self._state['next_index']}/{len(self._state['users'])}")
+            self._launch()
+            return True
+
+    def cancel(self):
+        """
+        Stop the running broadcast, whichever process runs it, or keep an
+        interrupted one from being resumed. Returns False if there is neither.
+        """
+        if self.running:
+            self._cancel.set()
+            return True
+        if not self.active() and not self.checkpoint_path.exists():
+            return False
+        try:
+            self.cancel_path.touch()
+        except OSError as e:
+            logger.error(f"Could not signal broadcast cancel: {e}")
+            return False
+        return True
+
+    def status(self):
+        """Progress snapshot of the current (or last) broadcast."""
+        state = self._state
+        if not state:
+            return {"running": False}
+        return {
+            "running": self.running,
+            "total": len(state['users']),
+            "next_index": state['next_index'],
+            "success": state['success'],
+            "blocked": state['blocked'],
+            "failed": state['failed'],
+            "rate": self.bucket.rate,
+            "concurrency": self.concurrency,
+        }
+
+    def _launch(self):
+        self._cancel.clear()
+        self._thread = threading.Thread(target=self._run, name='broadcast', daemon=True)
+        self._thread.start()
+
+    def _acquire_run_lock(self):
+        try:
+            self._lock_file = open(self.lock_path, 'w')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
+            return False
+
+    def _release_run_lock(self):
+        if self._lock_file:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _save_checkpoint(self):
+        tmp_path = self.checkpoint_path.with_name(self.checkpoint_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _run(self):
+        state = self._state
+        users = state['users']
+        total = len(users)
+        last_progress = 0.0
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='broadcast-send') as pool:
+                while state['next_index'] < total and not self._cancel.is_set():
+                    batch = users[state['next_index']:state['next_index'] + self.batch_size]
+                    for outcome in pool.map(self._send_one, batch):
+                        if outcome:
+                            state[outcome] += 1
+                            BROADCAST_SENDS.inc(outcome)
+                    state['next_index'] += len(batch)
+                    self._save_checkpoint()
+                    if self.cancel_path.exists():
+                        self._cancel.set()
+
+                    if time.monotonic() - last_progress >= 5:
+                        last_progress = time.monotonic()
+                        self._edit_progress(self._progress_text())
+
+            self._edit_progress(self._final_text(cancelled=self._cancel.is_set()))
+            self.checkpoint_path.unlink(missing_ok=True)
+            self.cancel_path.unlink(missing_ok=True)
+            logger.info(f"Broadcast finished: {self.status()}")
+        except Exception as e:
+            logger.error(f"Broadcast stopped by error, checkpoint kept for resume: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._release_run_lock()
+
+    def _send_one(self, target_user_id):
+        """Copy the message to one user. Returns 'success', 'blocked', 'failed' or None if cancelled."""
+        state = self._state
+        payload = {
+            'chat_id': target_user_id,
+            'from_chat_id': state['chat_id'],
+            'message_id': state['message_id']
+        }
+        while True:
+            if not self.bucket.acquire(self._cancel):
+                return None
+            try:
+                result = self.client.call('copyMessage', payload, retry_429=False)
+            except Exception as e:
+                return 'blocked' if 'blocked' in str(e).lower() else 'failed'
+
+            if result.get('ok'):
+                return 'success'
+            if result.get('error_code') == 429:
+                retry_after = result.get('parameters', {}).get('retry_after', 1)
+                logger.warning(f"Broadcast throttled by Telegram, pausing {retry_after}s")
+                self.bucket.pause(retry_after)
+                continue
+            error_text = result.get('description', '').lower()
+            return 'blocked' if 'blocked' in error_text else 'failed'
+
+    def _edit_progress(self, text):
+        try:
+            self.client.call('editMessageText', {
+                'chat_id': self._state['chat_id'],
+                'message_id': self._state['progress_message_id'],
+                'text': text,
+                'parse_mode': 'Markdown'
+            })
+        except Exception as e:
+            logger.warning(f"Could not update broadcast progress: {e}")
+
+    def _progress_text(self):
+        state = self._state
+        total = len(state['users'])
+        remaining = total - state['next_index']
+        return (
+            f"📤 **Broadcasting...**\n\n"
+            f"📊 Progress: {state['next_index']:,}/{total:,}\n"
+            f"✅ Sent: {state['success']:,}\n"
+            f"❌ Failed: {state['failed'] + state['blocked']:,}\n"
+            f"⏱️ Remaining: ~{int(remaining / self.bucket.rate / 60)} min"
+        )
+
+    def _final_text(self, cancelled=False):
+        state = self._state
+        total = len(state['users'])
+        title = "🛑 **Broadcast Stopped!**" if cancelled else "✅ **Broadcast Complete!**"
+        return (
+            f"{title}\n\n"
+            f"📊 **Statistics:**\n"
+            f"👥 Total Users: {total:,}\n"
+            f"✅ Successfully Sent: {state['success']:,}\n"
+            f"🚫 Blocked Bot: {state['blocked']:,}\n"
+            f"❌ Failed: {state['failed']:,}\n\n"
+            f"📈 Success Rate: {(state['success'] / max(total, 1) * 100):.1f}%"
+        )
@@ -0,0 +1,46 @@
+"""
+Inline keyboard callback_data - compact, catalog-versioned button payloads
+"""
+
+# Button kinds; ids are indexes from the voice catalog
+COUNTRY = 'c'              # c:<country>
+COUNTRY_PAGE = 'cp'        # cp:<page>
+LANGUAGE = 'l'             # l:<country>:<language>
+VOICE_PAGE = 'vp'          # vp:<country>:<language>:<page>
+VOICE = 'v'                # v:<voice>
+BACK_TO_COUNTRIES = 'bc'   # bc
+BACK_TO_LANGUAGES = 'bl'   # bl:<country>
+
+# Number of ids each kind carries
+ARITY = {
+    COUNTRY: 1, COUNTRY_PAGE: 1, LANGUAGE: 2, VOICE_PAGE: 3, VOICE: 1,
+    BACK_TO_COUNTRIES: 0, BACK_TO_LANGUAGES: 1,
+}
+
+# Telegram rejects callback_data longer than this many bytes
+MAX_CALLBACK_DATA = 64
+
+
+def encode(version, kind, *ids):
+    """Build callback_data like '1a2b3c4d|l:12:3' for a catalog version."""
+    data = ':'.join([f"{version}|{kind}", *map(str, ids)])
+    if len(data.encode('utf-8')) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback_data too long: {data}")
+    return data
+
+
+def decode(data):
+    """
+    Split callback_data into (version, kind, ids).
+    Returns None for malformed payloads, e.g. buttons from before this format.
+    """
+    version, sep, rest = data.partition('|')
+    if not sep:
+        return None
+    kind, *parts = rest.split(':')
+    if ARITY.get(kind) != len(parts):
+        return None
+    # Ids are plain indexes; int() alone would also take ' 1', '+1', '-1' or '1_0'
+    if not all(part.isascii() and part.isdigit() for part in parts):
+        return None
+    return version, kind, tuple(int(part) for part in parts)
@@ -11,6 +11,12 @@ from pathlib import Path
 # Get API token from environment variable (Heroku) or use default
 API_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '7813366733:AAHjgmubIbQPXEoxCkipp1BLbD1th96-rWw')
 
+# Bot API server (override to point at a local Bot API server)
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+
+# Edge TTS WebSocket endpoint override (e.g. the fake server in bench/); must include a query string
+EDGE_TTS_WSS_URL = os.environ.get('EDGE_TTS_WSS_URL')
+
 # Webhook URL - Set this to your Heroku app URL + /webhook
 WEBHOOK_URL = os.environ.get('WEBHOOK_URL', 'https://ttsbot-a572faff13b4.herokuapp.com/webhook')
 
@@ -26,6 +32,9 @@ else:
 
 VOICE_JSON_PATH = Path('voice.json')
 
+# How often (seconds) voice.json is checked for changes to hot-reload the catalog
+VOICE_CATALOG_CHECK_INTERVAL = 5
+
 # ==============================
 # Bot Settings
 # ==============================
@@ -40,6 +49,125 @@ MAX_TEXT_LENGTH = 5000
 COUNTRIES_PER_PAGE = 15
 VOICES_PER_PAGE = 5
 
+# Navigate menus by editing the menu message in place (one editMessageText per
+# click) instead of removing its keyboard and sending a new message
+MENU_EDIT_IN_PLACE = os.environ.get('MENU_EDIT_IN_PLACE', '1') == '1'
+
+# ==============================
+# TTS Worker Settings
+# ==============================
+
+# Number of background threads synthesizing audio for bot users
+TTS_WORKERS = int(os.environ.get('TTS_WORKERS', '2'))
+
+# Maximum number of TTS jobs waiting for a worker before new ones are rejected
+TTS_QUEUE_SIZE = int(os.environ.get('TTS_QUEUE_SIZE', '100'))
+
+# Texts longer than this are split on sentence boundaries and synthesized in parallel
+TTS_CHUNK_CHARS = int(os.environ.get('TTS_CHUNK_CHARS', '600'))
+
+# Maximum number of chunks of one text synthesized concurrently
+TTS_CHUNK_PARALLELISM = int(os.environ.get('TTS_CHUNK_PARALLELISM', '4'))
+
+# Total time budget (seconds) for synthesizing one text, retries included.
+# Web requests must finish inside Heroku's 30s router timeout.
+TTS_WEB_DEADLINE = float(os.environ.get('TTS_WEB_DEADLINE', '25'))
+TTS_JOB_DEADLINE = float(os.environ.get('TTS_JOB_DEADLINE', '60'))
+
+# Edge TTS circuit breaker: open after this many consecutive 403/handshake errors...
+EDGE_BREAKER_THRESHOLD = int(os.environ.get('EDGE_BREAKER_THRESHOLD', '5'))
+# ...and reject synthesis for this many seconds before probing again (doubles per failed probe)
+EDGE_BREAKER_RECOVERY = float(os.environ.get('EDGE_BREAKER_RECOVERY', '30'))
+
+# Adaptive (AIMD) limit on concurrent Edge TTS connections per process
+EDGE_CONCURRENCY_INITIAL = int(os.environ.get('EDGE_CONCURRENCY_INITIAL', '4'))
+EDGE_CONCURRENCY_MAX = int(os.environ.get('EDGE_CONCURRENCY_MAX', '16'))
+
+# ==============================
+# Update Recording
+# ==============================
+
+# When set, every webhook update is appended with a timestamp to this JSON
+# lines file so production traffic can be replayed with bench/replay.py
+WEBHOOK_RECORD_PATH = os.environ.get('WEBHOOK_RECORD_PATH')
+
+# ==============================
+# Tracing
+# ==============================
+
+# Updates taking longer than this (seconds, background TTS included) have their span tree logged
+TRACE_SLOW_SECONDS = float(os.environ.get('TRACE_SLOW_SECONDS', '5'))
+
+# Number of recently completed traces kept for /traces/slow
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', '500'))
+
+# ==============================
+# Profiling
+# ==============================
+
+# Token required by the /debug/profile endpoint; the endpoint is disabled when unset
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+
+# Stack sampling interval (seconds) and longest allowed profile
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.01'))
+PROFILE_MAX_SECONDS = 120
+
+# ==============================
+# Conversation State Settings
+# ==============================
+
+# 'memory' (single worker only) or 'sqlite' (shared by all gunicorn workers on the dyno)
+STATE_BACKEND = os.environ.get('STATE_BACKEND', 'memory')
+
+# Menu state is forgotten this many seconds after the user's last step
+STATE_TTL = int(os.environ.get('STATE_TTL', str(24 * 3600)))
+
+if os.environ.get('DYNO'):  # Heroku detection
+    STATE_DB_PATH = Path('/tmp/bot_state.sqlite3')
+else:
+    STATE_DB_PATH = Path('bot_state.sqlite3')
+
+# ==============================
+# Broadcast Settings
+# ==============================
+
+# Global send rate (messages/second) - Telegram allows about 30/s per bot
+BROADCAST_RATE = float(os.environ.get('BROADCAST_RATE', '25'))
+
+# Number of concurrent copyMessage calls during a broadcast
+BROADCAST_CONCURRENCY = int(os.environ.get('BROADCAST_CONCURRENCY', '8'))
+
+# Progress checkpoint used to resume a broadcast after a restart
+if os.environ.get('DYNO'):  # Heroku detection
+    BROADCAST_CHECKPOINT_PATH = Path('/tmp/broadcast_checkpoint.json')
+else:
+    BROADCAST_CHECKPOINT_PATH = Path('broadcast_checkpoint.json')
+
+# ==============================
+# Audio Cache Settings
+# ==============================
+
+# Synthesized audio is stored once per (voice, text) under this directory
+AUDIO_CACHE_DIR = BASE_AUDIO_DIR / 'cache'
+
+# Size budgets for the in-memory and on-disk cache tiers (bytes)
+AUDIO_CACHE_MEMORY_BYTES = int(os.environ.get('AUDIO_CACHE_MEMORY_BYTES', str(32 * 1024 * 1024)))
+AUDIO_CACHE_DISK_BYTES = int(os.environ.get('AUDIO_CACHE_DISK_BYTES', str(256 * 1024 * 1024)))
+
+# Disk budget for AUDIO_CACHE_DIR, the only directory the reaper manages; it deletes
+# the oldest files beyond it (the dyno's /tmp is shared with logs and state files)
+AUDIO_DISK_QUOTA = int(os.environ.get('AUDIO_DISK_QUOTA', str(384 * 1024 * 1024)))
+
+# Seconds between audio reaper passes and the most files deleted per pass
+AUDIO_REAPER_INTERVAL = 30
+AUDIO_REAPER_BATCH = 200
+
+# Telegram file_ids of already uploaded audio, so repeats are sent by reference
+if os.environ.get('DYNO'):  # Heroku detection
+    FILE_ID_INDEX_PATH = Path('/tmp/file_ids.jsonl')
+else:
+    FILE_ID_INDEX_PATH = Path('file_ids.jsonl')
+
 # ==============================
 # Channel & Owner Settings
 # ==============================
@@ -0,0 +1,262 @@
+"""
+Edge TTS protection - shared circuit breaker and AIMD concurrency limit
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import deque
+
+from aiohttp.client_exceptions import WSServerHandshakeError
+
+logger = logging.getLogger(__name__)
+
+
+class EdgeUnavailableError(Exception):
+    """Raised without contacting Edge while the circuit breaker is open."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Edge TTS is throttling us, circuit open for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+# Prefix of the message app._raise_tts_error() gives rejected Edge handshakes
+EDGE_403_PREFIX = 'Edge TTS 403 error'
+
+
+def classify_error(e):
+    """Map a synthesis exception to an error class: 403, no_audio, timeout, invalid, unavailable or other."""
+    if isinstance(e, EdgeUnavailableError):
+        return 'unavailable'
+    if isinstance(e, (asyncio.TimeoutError, concurrent.futures.TimeoutError, TimeoutError)):
+        return 'timeout'
+    error_str = str(e)
+    # Before the 403 checks: no-audio messages embed the text length, which may contain "403"
+    if 'No audio was received' in error_str:
+        return 'no_audio'
+    if isinstance(e, WSServerHandshakeError) and getattr(e, 'status', None) == 403:
+        return '403'
+    if error_str.startswith(EDGE_403_PREFIX):
+        return '403'
+    if 'timed out' in error_str:
+        return 'timeout'
+    if 'Invalid voice' in error_str:
+        return 'invalid'
+    return 'other'
+
+
+def is_throttle_error(e):
+    """True for errors that mean Edge is rejecting us (a 403 on the WebSocket handshake)."""
+    return classify_error(e) == '403'
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive throttle errors and rejects calls
+    for `recovery_time` seconds. Then one probe call is let through: success
+    closes the breaker, failure reopens it with a doubled recovery time
+    (up to max_recovery_time).
+    """
+
+    def __init__(self, threshold=5, recovery_time=30.0, max_recovery_time=300.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.base_recovery_time = recovery_time
+        self.max_recovery_time = max_recovery_time
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._recovery_time = recovery_time
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._times_opened = 0
+        self._rejected = 0
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through (0 when closed)."""
+        with self._lock:
+            if self._state == 'closed':
+                return 0.0
+            return max(0.0, self._opened_at + self._recovery_time - self._clock())
+
+    def allow(self):
+        """Return True if a call may proceed; in half-open state only one probe is allowed."""
+        with self._lock:
+            if self._state == 'closed':
+                return True
+            if self._state == 'open':
+                if self._clock() < self._opened_at + self._recovery_time:
+                    self._rejected += 1
+                    return False
+                self._state = 'half_open'
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                self._rejected += 1
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != 'closed':
+                logger.info("Edge TTS circuit closed, probe succeeded")
+            self._state = 'closed'
+            self._failures = 0
+            self._recovery_time = self.base_recovery_time
+            self._probe_in_flight = False
+
+    def record_neutral(self):
+        """A call ended without telling us whether Edge is throttling; free the probe slot."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == 'half_open':
+                self._recovery_time = min(self._recovery_time * 2, self.max_recovery_time)
+                self._open()
+                return
+            self._failures += 1
+            if self._state == 'closed' and self._failures >= self.threshold:
+                self._open()
+
+    def _open(self):
+        self._state = 'open'
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self._times_opened += 1
+        logger.warning(f"Edge TTS circuit opened for {self._recovery_time:.0f}s after {self._failures} throttle errors")
+
+    def stats(self):
+        with self._lock:
+            state = self._state
+            if state == 'open' and self._clock() >= self._opened_at + self._recovery_time:
+                state = 'half_open'
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "recovery_time": self._recovery_time,
+                "times_opened": self._times_opened,
+                "rejected": self._rejected,
+            }
+
+
+class AimdLimiter:
+    """
+    Adaptive concurrency limit for coroutines on one event loop.
+
+    The limit grows by about one slot per `limit` successes (additive
+    increase) and halves on a throttle error (multiplicative decrease), at
+    most once per `decrease_cooldown` seconds so that a burst of concurrent
+    failures counts as one signal.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, decrease_cooldown=2.0, clock=time.monotonic):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_cooldown = decrease_cooldown
+        self._clock = clock
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = None
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(self._limit))
+
+    async def acquire(self):
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just before cancellation; give it back
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self):
+        self._limit = min(self.maximum, self._limit + 1 / self._limit)
+        self._wake()
+
+    def on_throttle(self):
+        now = self._clock()
+        if self._last_decrease is not None and now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.minimum, self._limit / 2)
+        logger.info(f"Edge TTS concurrency limit reduced to {self.limit}")
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+        }
+
+
+class EdgeGuard:
+    """Runs Edge TTS calls through the circuit breaker and the concurrency limiter."""
+
+    def __init__(self, breaker, limiter):
+        self.breaker = breaker
+        self.limiter = limiter
+
+    def is_open(self):
+        """True while calls are being rejected (checked without taking a probe slot)."""
+        return self.breaker.retry_after() > 0
+
+    async def call(self, make_coro):
+        """Await make_coro() under protection; raises EdgeUnavailableError while open."""
+        if not self.breaker.allow():
+            raise EdgeUnavailableError(self.breaker.retry_after())
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.record_neutral()
+            raise
+
+        outcome = None
+        try:
+            result = await make_coro()
+            outcome = 'success'
+            return result
+        except Exception as e:
+            if is_throttle_error(e):
+                outcome = 'throttle'
+            raise
+        finally:
+            self.limiter.release()
+            if outcome == 'success':
+                self.breaker.record_success()
+                self.limiter.on_success()
+            elif outcome == 'throttle':
+                self.breaker.record_failure()
+                self.limiter.on_throttle()
+            else:
+                # Other errors and cancellations say nothing about throttling
+                self.breaker.record_neutral()
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.stats(),
+            "concurrency": self.limiter.stats(),
+        }
@@ -0,0 +1,115 @@
+"""
+Persistent map of audio cache keys to Telegram file_ids
+"""
+import json
+import logging
+import threading
+from pathlib import Path
+
+from .append_log import AppendLog
+from .metrics import FILE_ID_LOOKUPS, FILE_IO_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class FileIdIndex:
+    """
+    Remembers the Telegram file_id returned for each uploaded audio so the
+    same (voice, text) can be re-sent by reference instead of re-uploaded.
+
+    Entries are kept in memory and persisted with an AppendLog: a JSON
+    snapshot next to an append-only JSON lines journal, in which a null
+    file_id records a removal. The journal is folded into the snapshot when
+    it grows past the number of live entries. Several worker processes can
+    share the files; each applies the others' records before every lookup.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._hits = 0
+        self._misses = 0
+        self._log = AppendLog(
+            self.path.with_suffix('.json'),
+            self.path,
+            self.path.with_name(self.path.name + '.lock'),
+            load=self._load_snapshot,
+            apply=self._apply
+        )
+        with self._lock:
+            self._refresh()
+        if self._entries:
+            logger.info(f"Loaded {len(self._entries)} Telegram file_ids from {self.path}")
+
+    def _refresh(self):
+        try:
+            self._log.refresh()
+        except Exception as e:
+            logger.error(f"Error reading file_id index: {e}")
+
+    def _load_snapshot(self, data):
+        self._entries = {}
+        if data is None:
+            return
+        try:
+            self._entries = json.loads(data)
+        except ValueError:
+            logger.error(f"Corrupt file_id snapshot {self._log.snapshot_path}, starting from the journal")
+
+    def _apply(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            logger.warning(f"Skipping corrupt line in {self.path}")
+            return
+        if record.get('file_id'):
+            self._entries[record['key']] = record['file_id']
+        else:
+            self._entries.pop(record.get('key'), None)
+
+    def get(self, key):
+        """Return the file_id stored for key, or None."""
+        with self._lock:
+            self._refresh()
+            file_id = self._entries.get(key)
+            if file_id:
+                self._hits += 1
+            else:
+                self._misses += 1
+        FILE_ID_LOOKUPS.inc('hit' if file_id else 'miss')
+        return file_id
+
+    def set(self, key, file_id):
+        """Store the file_id for key."""
+        self._write(key, file_id)
+
+    def discard(self, key):
+        """Forget key, e.g. after Telegram rejected its file_id."""
+        self._write(key, None)
+
+    def _write(self, key, file_id):
+        try:
+            with self._lock, self._log.lock():
+                self._log.refresh()
+                if self._entries.get(key) == file_id:
+                    return
+                line = json.dumps({'key': key, 'file_id': file_id}).encode('utf-8')
+                with FILE_IO_SECONDS.time('file_id_append'):
+                    self._log.append(line)
+                if self._log.entries > len(self._entries) + 100:
+                    self._log.compact(json.dumps(self._entries).encode('utf-8'))
+                    logger.info(f"Compacted file_id index to {len(self._entries)} entries")
+        except Exception as e:
+            logger.error(f"Error persisting file_id index: {e}")
+
+    def stats(self):
+        """Return entry count and reuse hit ratio."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,148 @@
+"""
+Background job queue - runs slow work (TTS) off the webhook thread
+"""
+import contextvars
+import logging
+import queue
+import threading
+import time
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a queue that has no free slot."""
+
+
+class JobQueue:
+    """
+    Bounded FIFO of jobs served by a fixed pool of daemon worker threads.
+
+    Workers are started lazily on the first submit so that importing the
+    app (e.g. in the gunicorn master) does not spawn threads.
+    """
+
+    def __init__(self, name, workers=2, max_size=100):
+        self.name = name
+        self.workers = workers
+        self.max_size = max_size
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started_at = None
+
+        # Counters (guarded by _lock)
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._picked = 0
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def start(self):
+        """Start the worker threads if they are not running yet."""
+        with self._lock:
+            if self._threads:
+                return
+            self._started_at = time.monotonic()
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f"{self.name}-worker-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self.workers} '{self.name}' workers (queue size {self.max_size})")
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Enqueue func(*args, **kwargs) without blocking.
+        Raises QueueFullError if the queue is at capacity.
+
+        The job runs in a copy of the caller's context, so it joins the
+        caller's trace, which stays open until the job has finished.
+        """
+        self.start()
+        trace = tracing.current_trace()
+        if trace:
+            trace.retain()
+        try:
+            self._queue.put_nowait((time.monotonic(), contextvars.copy_context(), trace, func, args, kwargs))
+        except queue.Full:
+            if trace:
+                trace.release()
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"'{self.name}' queue full ({self.max_size}), job rejected")
+            raise QueueFullError(f"{self.name} queue is full")
+        with self._lock:
+            self._submitted += 1
+
+    def depth(self):
+        """Number of jobs waiting to be picked up."""
+        return self._queue.qsize()
+
+    def _worker(self):
+        while True:
+            enqueued_at, context, trace, func, args, kwargs = self._queue.get()
+            started = time.monotonic()
+            waited = started - enqueued_at
+            with self._lock:
+                self._busy += 1
+                self._picked += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+            failed = False
+            try:
+                context.run(self._run_job, enqueued_at, started, func, args, kwargs)
+            except Exception as e:
+                failed = True
+                logger.error(f"'{self.name}' job {getattr(func, '__name__', func)} failed: {e}", exc_info=True)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self._busy -= 1
+                    self._busy_seconds += elapsed
+                    self._run_total += elapsed
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+                if trace:
+                    trace.release()
+                self._queue.task_done()
+
+    def _run_job(self, enqueued_at, started, func, args, kwargs):
+        tracing.record_span(f"{self.name}.queue_wait", enqueued_at, started)
+        with tracing.span(f"{self.name}.{getattr(func, '__name__', 'job')}"):
+            func(*args, **kwargs)
+
+    def stats(self):
+        """Return a snapshot of queue depth, wait times and worker utilisation."""
+        with self._lock:
+            finished = self._completed + self._failed
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            capacity = uptime * self.workers
+            return {
+                "workers": self.workers,
+                "running": len(self._threads),
+                "busy_workers": self._busy,
+                "depth": self._queue.qsize(),
+                "max_size": self.max_size,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_seconds": round(self._wait_total / self._picked, 3) if self._picked else 0.0,
+                "max_wait_seconds": round(self._wait_max, 3),
+                "avg_run_seconds": round(self._run_total / finished, 3) if finished else 0.0,
+                "utilisation": round(self._busy_seconds / capacity, 3) if capacity else 0.0,
+            }
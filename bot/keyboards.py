@@ -1,12 +1,19 @@
 """
 Keyboard builders for the Telegram TTS Bot - Pure Flask/JSON
 """
+import json
+import threading
+
 from .config import COUNTRIES_PER_PAGE, VOICES_PER_PAGE
-from .utils import sanitize_callback_data
+from . import callback_data
+from .callback_data import (
+    COUNTRY, COUNTRY_PAGE, LANGUAGE, VOICE_PAGE, VOICE, BACK_TO_COUNTRIES, BACK_TO_LANGUAGES
+)
 
 
-def create_country_keyboard(countries, page=0):
+def create_country_keyboard(catalog, page=0):
     """Create an inline keyboard for country selection with pagination."""
+    countries = catalog.get_countries()
     keyboard = []
     total_pages = (len(countries) + COUNTRIES_PER_PAGE - 1) // COUNTRIES_PER_PAGE
 
@@ -17,10 +24,10 @@ def create_country_keyboard(countries, page=0):
     # Add country buttons (3 per row)
     for i in range(0, len(page_countries), 3):
         row = []
-        for country in page_countries[i:i+3]:
+        for offset, country in enumerate(page_countries[i:i+3]):
             row.append({
                 "text": country,
-                "callback_data": f'country:{sanitize_callback_data(country)}'
+                "callback_data": callback_data.encode(catalog.version, COUNTRY, start + i + offset)
             })
         keyboard.append(row)
 
@@ -29,12 +36,12 @@ def create_country_keyboard(countries, page=0):
     if page > 0:
         nav_buttons.append({
             "text": "⬅️ Previous",
-            "callback_data": f'country_page:{page - 1}'
+            "callback_data": callback_data.encode(catalog.version, COUNTRY_PAGE, page - 1)
         })
     if page < total_pages - 1:
         nav_buttons.append({
             "text": "Next ➡️",
-            "callback_data": f'country_page:{page + 1}'
+            "callback_data": callback_data.encode(catalog.version, COUNTRY_PAGE, page + 1)
         })
     
     if nav_buttons:
@@ -43,23 +50,26 @@ def create_country_keyboard(countries, page=0):
     return {"inline_keyboard": keyboard}
 
 
-def create_language_keyboard(languages):
+def create_language_keyboard(catalog, country_id):
     """Create an inline keyboard for language selection."""
+    languages = catalog.get_languages(catalog.country_name(country_id))
     keyboard = []
-    for language in languages:
+    for language_id, language in enumerate(languages):
         keyboard.append([{
             "text": language,
-            "callback_data": f'language:{sanitize_callback_data(language)}'
+            "callback_data": callback_data.encode(catalog.version, LANGUAGE, country_id, language_id)
         }])
     keyboard.append([{
         "text": "⬅️ Back",
-        "callback_data": "back_to_countries"
+        "callback_data": callback_data.encode(catalog.version, BACK_TO_COUNTRIES)
     }])
     return {"inline_keyboard": keyboard}
 
 
-def create_voice_keyboard(voices, page=0):
+def create_voice_keyboard(catalog, country_id, language_id, page=0):
     """Create an inline keyboard for voice selection with pagination."""
+    country_name = catalog.country_name(country_id)
+    voices = catalog.get_voices(country_name, catalog.language_name(country_name, language_id))
     keyboard = []
     total_pages = (len(voices) + VOICES_PER_PAGE - 1) // VOICES_PER_PAGE
 
@@ -69,10 +79,9 @@ def create_voice_keyboard(voices, page=0):
 
     for voice in page_voices:
         button_text = f"{voice['ShortName']} ({voice['Gender']})"
-        sanitized_voice_name = sanitize_callback_data(voice['ShortName'])
         keyboard.append([{
             "text": button_text,
-            "callback_data": f'voice:{sanitized_voice_name}'
+            "callback_data": callback_data.encode(catalog.version, VOICE, catalog.voice_id(voice['ShortName']))
         }])
 
     # Navigation buttons
@@ -80,23 +89,76 @@ def create_voice_keyboard(voices, page=0):
     if page > 0:
         nav_buttons.append({
             "text": "⬅️ Previous",
-            "callback_data": f'voice_page:{page - 1}'
+            "callback_data": callback_data.encode(catalog.version, VOICE_PAGE, country_id, language_id, page - 1)
         })
     if page < total_pages - 1:
         nav_buttons.append({
             "text": "Next ➡️",
-            "callback_data": f'voice_page:{page + 1}'
+            "callback_data": callback_data.encode(catalog.version, VOICE_PAGE, country_id, language_id, page + 1)
         })
     if nav_buttons:
         keyboard.append(nav_buttons)
 
     keyboard.append([{
         "text": "⬅️ Back",
-        "callback_data": "back_to_languages"
+        "callback_data": callback_data.encode(catalog.version, BACK_TO_LANGUAGES, country_id)
     }])
     return {"inline_keyboard": keyboard}
 
 
+class KeyboardCache:
+    """
+    Serialized reply_markup strings keyed by (kind, key, page, catalog version).
+
+    Menus depend only on the catalog, so every user shares one copy of
+    each page; only the current catalog version is kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._markups = {}
+        self._hits = 0
+        self._misses = 0
+
+    def country(self, catalog, page=0):
+        return self._get(catalog, 'country', None, page, lambda: create_country_keyboard(catalog, page))
+
+    def language(self, catalog, country_id):
+        return self._get(catalog, 'language', country_id, 0, lambda: create_language_keyboard(catalog, country_id))
+
+    def voice(self, catalog, country_id, language_id, page=0):
+        return self._get(catalog, 'voice', (country_id, language_id), page,
+                         lambda: create_voice_keyboard(catalog, country_id, language_id, page))
+
+    def _get(self, catalog, kind, key, page, build):
+        cache_key = (kind, key, page)
+        with self._lock:
+            if self._version == catalog.version:
+                markup = self._markups.get(cache_key)
+                if markup is not None:
+                    self._hits += 1
+                    return markup
+            self._misses += 1
+
+        markup = json.dumps(build(), ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            if self._version != catalog.version:
+                self._version = catalog.version
+                self._markups = {}
+            self._markups[cache_key] = markup
+        return markup
+
+    def stats(self):
+        with self._lock:
+            return {
+                "catalog_version": self._version,
+                "entries": len(self._markups),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
 def create_join_keyboard():
     """Create keyboard with join channel button."""
     return {
@@ -0,0 +1,185 @@
+"""
+Metrics - counters, gauges and histograms exposed in the Prometheus text format
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from cache hits to slow Edge syntheses
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_str(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination: counter.inc('403')."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_label_str(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Current value, either set explicitly or read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._callback = callback
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def set_callback(self, callback):
+        """callback() returns a number, or a dict of label tuple -> number."""
+        self._callback = callback
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            values = dict(self._values)
+        if self._callback is not None:
+            try:
+                result = self._callback()
+            except Exception:
+                result = None
+            if isinstance(result, dict):
+                values.update(result)
+            elif result is not None:
+                values[()] = result
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_label_str(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed distribution per label combination: histogram.observe(seconds, 'sendAudio')."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, labels, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# ==============================
+# Latency histograms
+# ==============================
+
+WEBHOOK_SECONDS = REGISTRY.register(Histogram(
+    'ttsbot_webhook_seconds', 'Time to handle one webhook update', ['update_type']))
+TTS_ATTEMPT_SECONDS = REGISTRY.register(Histogram(
+    'ttsbot_tts_attempt_seconds', 'Duration of one Edge TTS synthesis attempt', ['outcome']))
+TELEGRAM_SECONDS = REGISTRY.register(Histogram(
+    'ttsbot_telegram_api_seconds', 'Duration of Telegram Bot API calls', ['method']))
+FILE_IO_SECONDS = REGISTRY.register(Histogram(
+    'ttsbot_file_io_seconds', 'Duration of file reads and writes', ['operation']))
+
+# ==============================
+# Counters and gauges
+# ==============================
+
+TTS_RETRIES = REGISTRY.register(Counter(
+    'ttsbot_tts_retries_total', 'Edge TTS attempts retried, by error class', ['error_class']))
+TTS_GIVE_UPS = REGISTRY.register(Counter(
+    'ttsbot_tts_give_ups_total', 'TTS requests that failed, by give-up reason', ['reason']))
+AUDIO_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'ttsbot_audio_cache_lookups_total', 'Audio cache lookups by result', ['result']))
+FILE_ID_LOOKUPS = REGISTRY.register(Counter(
+    'ttsbot_file_id_lookups_total', 'Telegram file_id index lookups by result', ['result']))
+AUDIO_REAPED = REGISTRY.register(Counter(
+    'ttsbot_audio_reaped_total', 'Audio files deleted by the reaper, by reason', ['reason']))
+BROADCAST_SENDS = REGISTRY.register(Counter(
+    'ttsbot_broadcast_sends_total', 'Broadcast deliveries by outcome', ['outcome']))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'ttsbot_queue_depth', 'Jobs waiting in background queues', ['queue']))
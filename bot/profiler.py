@@ -0,0 +1,77 @@
+"""
+Sampling profiler - periodic stack snapshots of all threads in collapsed-stack format
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _frame_label(code):
+    path = code.co_filename.replace(os.sep, '/')
+    short = '/'.join(path.rsplit('/', 2)[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread (Flask handlers, TTS workers, the
+    TTS event loop, broadcast senders) via sys._current_frames().
+
+    Output is one "thread;outer;...;inner count" line per distinct stack,
+    ready for flamegraph.pl or speedscope. Idle threads are included, so
+    counts are wall-clock time. Sampling at 100 Hz costs well under a
+    millisecond per tick, so it can be run on the live dyno.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def profile(self, seconds):
+        """Sample for `seconds` and return collapsed stacks (raises ProfilerBusyError if already running)."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        try:
+            return self._sample(seconds)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds):
+        me = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        started = time.monotonic()
+        deadline = started + seconds
+        labels = {}  # code object -> label, to keep each tick cheap
+
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    frames.append(label)
+                    frame = frame.f_back
+                frames.append(names.get(ident, f"thread-{ident}"))
+                stacks[';'.join(reversed(frames))] += 1
+            samples += 1
+            time.sleep(self.interval)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Profiled {samples} ticks every {self.interval * 1000:.0f}ms over {elapsed:.1f}s, "
+                    f"{len(stacks)} distinct stacks")
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
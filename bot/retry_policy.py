@@ -0,0 +1,100 @@
+"""
+Retry policy for Edge TTS - spends one overall deadline across attempts
+"""
+import random
+import time
+
+from .edge_guard import classify_error
+
+# Retries allowed per error class (the first attempt is not a retry)
+DEFAULT_BUDGETS = {
+    '403': 3,
+    'no_audio': 2,
+    'timeout': 2,
+    'other': 2,
+    'invalid': 0,
+    'unavailable': 0,
+}
+
+# Base backoff per error class in seconds; 403s back off harder
+BASE_DELAYS = {
+    '403': 1.0,
+    'no_audio': 0.5,
+    'timeout': 0.25,
+    'other': 0.5,
+}
+
+
+class GiveUpError(Exception):
+    """Tells callers sharing another request's attempts that its policy gave up."""
+
+    def __init__(self, reason):
+        super().__init__(f"TTS generation gave up: {reason}")
+        self.reason = reason
+
+
+class RetryPolicy:
+    """
+    Per-request retry state bounded by a total deadline.
+
+    The first attempt starts immediately. Each failure is charged to its
+    error class; the request gives up when that class's budget is spent or
+    when the remaining time cannot fit a backoff plus a useful attempt.
+    give_up_reason then says why (e.g. '403_budget', 'deadline', 'invalid',
+    'unavailable' when the Edge circuit breaker is open).
+    """
+
+    def __init__(self, deadline, budgets=None, max_delay=4.0, min_attempt_time=3.0, max_attempt_time=15.0):
+        self.deadline = deadline
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.max_delay = max_delay
+        self.min_attempt_time = min_attempt_time
+        self.max_attempt_time = max_attempt_time
+        self.started = time.monotonic()
+        self.attempts = 0
+        self.failures = {}  # error class -> count
+        self.last_error = None
+        self.last_error_class = None
+        self.give_up_reason = None
+
+    def remaining(self):
+        return self.deadline - (time.monotonic() - self.started)
+
+    def attempt_timeout(self):
+        """Time allowed for the next attempt, or None (with give_up_reason set) if none is left."""
+        remaining = self.remaining()
+        if remaining < self.min_attempt_time and self.attempts > 0:
+            self.give_up_reason = 'deadline'
+            return None
+        self.attempts += 1
+        # Whole seconds: edge_tts only accepts integer timeouts
+        return max(1, int(min(remaining, self.max_attempt_time)))
+
+    def record_failure(self, e):
+        """
+        Charge a failed attempt and return the backoff delay before the next
+        one, or None when the request should give up.
+        """
+        error_class = classify_error(e)
+        self.last_error = e
+        self.last_error_class = error_class
+        count = self.failures.get(error_class, 0) + 1
+        self.failures[error_class] = count
+
+        if count > self.budgets.get(error_class, 0):
+            self.give_up_reason = error_class if error_class in ('invalid', 'unavailable') else f"{error_class}_budget"
+            return None
+
+        base = BASE_DELAYS.get(error_class, 0.5)
+        delay = random.uniform(base, min(base * 2 ** count, self.max_delay))
+        if self.remaining() - delay < self.min_attempt_time:
+            self.give_up_reason = 'deadline'
+            return None
+        return delay
+
+    def summary(self):
+        """One-line description of how the request went, for logs."""
+        elapsed = time.monotonic() - self.started
+        failures = ', '.join(f"{name}={count}" for name, count in sorted(self.failures.items())) or 'none'
+        return (f"attempts={self.attempts}, elapsed={elapsed:.1f}s/{self.deadline}s, "
+                f"failures: {failures}, gave up: {self.give_up_reason or 'no'}")
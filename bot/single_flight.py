@@ -0,0 +1,182 @@
+"""
+Single-flight - concurrent identical calls share one execution
+"""
+import threading
+import time
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SharedStream:
+    """
+    Chunks written once by a producer and replayed to any number of readers.
+
+    Every reader starts at the first chunk, so readers that join late still
+    receive the whole stream. The producer ends it with finish(), passing
+    the exception readers should raise if it failed.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._chunks = []
+        self._done = False
+        self._error = None
+        self.followers = 0
+
+    def append(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def read(self, first_timeout=None, timeout=None):
+        """
+        Yield every chunk from the start as it becomes available. Raises the
+        producer's error, or TimeoutError when the first chunk takes longer
+        than first_timeout or a later one longer than timeout.
+        """
+        index = 0
+        wait = first_timeout
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: index < len(self._chunks) or self._done, wait):
+                    raise TimeoutError(f"No data from shared stream within {wait:.0f}s")
+                if index < len(self._chunks):
+                    chunk = self._chunks[index]
+                elif self._error is not None:
+                    raise self._error
+                else:
+                    return
+            index += 1
+            wait = timeout
+            yield chunk
+
+    def wait(self, timeout=None):
+        """Wait until the stream is finished; returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._done, timeout)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it runs wait for and receive the leader's result or
+    exception. Once the call finishes the key is forgotten, so later calls
+    run again (results are expected to be cached elsewhere, and leaders
+    should check that cache first).
+
+    A key can instead be claimed by a stream (see stream()), whose readers
+    replay a SharedStream. Calls and streams share one table, so at most one
+    of either runs per key: do() waits for a live stream before running,
+    and stream() waits for a running call before starting a stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call or SharedStream
+        self._leaders = 0
+        self._followers = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() once per key among concurrent callers and return
+        (result, shared), where shared is True for followers.
+        Raises TimeoutError if the call or stream in flight takes longer than timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    self._leaders += 1
+                    break
+                call.followers += 1
+                self._followers += 1
+
+            if isinstance(call, SharedStream):
+                # A stream is producing this result; run once it has finished
+                if not call.wait(self._remaining(deadline)):
+                    raise TimeoutError(f"Timed out waiting for live stream {key}")
+                continue
+            if not call.done.wait(self._remaining(deadline)):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, start, timeout=None):
+        """
+        Return (stream, shared), the SharedStream for key. For the first
+        caller, start(stream) is called to launch a producer, which must end
+        it with finish(); shared is then False. A call in flight for key is
+        waited for first (TimeoutError after timeout), so the producer should
+        check the cache before synthesizing.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                entry = self._calls.get(key)
+                if entry is None:
+                    stream = self._calls[key] = SharedStream()
+                    self._leaders += 1
+                    break
+                entry.followers += 1
+                self._followers += 1
+                if isinstance(entry, SharedStream):
+                    return entry, True
+
+            if not entry.done.wait(self._remaining(deadline)):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key}")
+
+        try:
+            start(stream)
+        except BaseException as e:
+            self.finish(key, stream, e)
+            raise
+        return stream, False
+
+    def finish(self, key, stream, error=None):
+        """End a stream started by stream() and forget the key."""
+        with self._lock:
+            if self._calls.get(key) is stream:
+                del self._calls[key]
+        stream.finish(error)
+
+    @staticmethod
+    def _remaining(deadline):
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "streams": sum(isinstance(call, SharedStream) for call in self._calls.values()),
+                "waiting": sum(call.followers for call in self._calls.values()),
+                "leaders": self._leaders,
+                "followers": self._followers,
+            }
@@ -0,0 +1,158 @@
+"""
+Conversation state storage - per-user menu state with TTL expiry
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore(ABC):
+    """
+    Interface for per-user conversation state.
+
+    State is a small JSON-serializable dict, e.g.
+    {'state': 'ready_for_text', 'voice': 'en-US-AriaNeural'}.
+    Entries expire `ttl` seconds after their last write.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, user_id):
+        """Return the user's state dict, or {} if missing or expired."""
+
+    @abstractmethod
+    def set(self, user_id, state):
+        """Replace the user's state."""
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Forget the user's state."""
+
+    def update(self, user_id, **fields):
+        """Merge fields into the user's state and return the new state."""
+        state = self.get(user_id)
+        state.update(fields)
+        self.set(user_id, state)
+        return state
+
+    def stats(self):
+        return {"backend": type(self).__name__, "ttl": self.ttl}
+
+
+class MemoryStateStore(StateStore):
+    """Process-local store; only correct with a single gunicorn worker."""
+
+    def __init__(self, ttl, sweep_interval=300):
+        super().__init__(ttl)
+        self._lock = threading.Lock()
+        self._entries = {}  # user_id -> (expires_at, state)
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return {}
+            if entry[0] < now:
+                del self._entries[user_id]
+                return {}
+            return dict(entry[1])
+
+    def set(self, user_id, state):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, dict(state))
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _sweep(self, now):
+        expired = [uid for uid, (expires_at, _) in self._entries.items() if expires_at < now]
+        for uid in expired:
+            del self._entries[uid]
+        self._next_sweep = now + self._sweep_interval
+        if expired:
+            logger.debug(f"Expired {len(expired)} conversation states")
+
+    def stats(self):
+        with self._lock:
+            return {**super().stats(), "entries": len(self._entries)}
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Store shared by all worker processes on the dyno via a WAL-mode SQLite file.
+    Each thread keeps its own connection.
+    """
+
+    def __init__(self, ttl, path, sweep_interval=300):
+        super().__init__(ttl)
+        self.path = str(path)
+        self._local = threading.local()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_state ("
+            "user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        row = self._conn().execute(
+            "SELECT data FROM user_state WHERE user_id = ? AND expires_at >= ?",
+            (user_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set(self, user_id, state):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO user_state (user_id, data, expires_at) VALUES (?, ?, ?)",
+            (user_id, json.dumps(state, separators=(',', ':')), now + self.ttl)
+        )
+        if now >= self._next_sweep:
+            self._next_sweep = now + self._sweep_interval
+            conn.execute("DELETE FROM user_state WHERE expires_at < ?", (now,))
+        conn.commit()
+
+    def delete(self, user_id):
+        conn = self._conn()
+        conn.execute("DELETE FROM user_state WHERE user_id = ?", (user_id,))
+        conn.commit()
+
+    def stats(self):
+        count = self._conn().execute("SELECT COUNT(*) FROM user_state").fetchone()[0]
+        return {**super().stats(), "entries": count, "path": self.path}
+
+
+def create_state_store(backend, ttl, sqlite_path):
+    """Build the state store selected by STATE_BACKEND ('memory' or 'sqlite')."""
+    if backend == 'sqlite':
+        logger.info(f"Using SQLite conversation state store at {sqlite_path}")
+        return SQLiteStateStore(ttl, sqlite_path)
+    if backend != 'memory':
+        logger.warning(f"Unknown STATE_BACKEND '{backend}', using in-memory state")
+    return MemoryStateStore(ttl)
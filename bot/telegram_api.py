@@ -0,0 +1,124 @@
+"""
+Telegram Bot API client - pooled keep-alive connections with 429 handling
+"""
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import tracing
+from .metrics import TELEGRAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Default per-method timeouts in seconds (uploads get longer)
+DEFAULT_TIMEOUT = 10
+METHOD_TIMEOUTS = {
+    'answerCallbackQuery': 5,
+    'sendAudio': 30,
+    'sendDocument': 30,
+}
+
+
+class TelegramClient:
+    """
+    Thin Bot API client sharing one requests.Session across threads.
+
+    The session keeps TCP+TLS connections to api.telegram.org alive, so
+    consecutive calls skip the handshake. Flood-control replies (HTTP 429)
+    are retried after the server-provided retry_after only while the total
+    sleep stays within max_429_wait; otherwise the 429 result is returned
+    to the caller. Calls run on webhook request threads, so the budget is
+    kept short; the broadcast engine handles long waits in its own bucket.
+    """
+
+    def __init__(self, token, base_url='https://api.telegram.org', pool_size=20, max_429_wait=1):
+        self.api_url = f"{base_url.rstrip('/')}/bot{token}"
+        self.max_429_wait = max_429_wait
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def call(self, method, payload=None, files=None, timeout=None, retry_429=True):
+        """
+        Call a Bot API method and return the decoded JSON result.
+
+        JSON payloads are sent as the request body; when files are given the
+        payload is sent as multipart form fields instead. Network errors are
+        raised to the caller.
+        """
+        url = f"{self.api_url}/{method}"
+        if timeout is None:
+            timeout = METHOD_TIMEOUTS.get(method, DEFAULT_TIMEOUT)
+
+        waited = 0
+        while True:
+            started = time.monotonic()
+            error = True
+            try:
+                if files:
+                    for f in files.values():
+                        if hasattr(f, 'seek'):
+                            f.seek(0)
+                    response = self.session.post(url, data=payload, files=files, timeout=timeout)
+                else:
+                    response = self.session.post(url, json=payload or {}, timeout=timeout)
+                result = response.json()
+                error = not result.get('ok')
+            finally:
+                finished = time.monotonic()
+                self._record(method, finished - started, error)
+                tracing.record_span(f"telegram.{method}", started, finished, **({'failed': True} if error else {}))
+
+            if result.get('error_code') != 429:
+                return result
+
+            retry_after = result.get('parameters', {}).get('retry_after', 1)
+            self._record_throttle(method)
+            if not retry_429:
+                return result
+            if waited + retry_after > self.max_429_wait:
+                logger.warning(f"Telegram {method} rate limited (retry_after={retry_after}s), giving up")
+                return result
+
+            waited += retry_after
+            logger.warning(f"Telegram {method} rate limited, retrying in {retry_after}s")
+            time.sleep(retry_after)
+
+    def _record(self, method, elapsed, error):
+        TELEGRAM_SECONDS.observe(elapsed, method)
+        with self._lock:
+            entry = self._stats.setdefault(method, {
+                "calls": 0, "errors": 0, "throttled": 0,
+                "total_seconds": 0.0, "max_seconds": 0.0
+            })
+            entry["calls"] += 1
+            entry["total_seconds"] += elapsed
+            entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+            if error:
+                entry["errors"] += 1
+
+    def _record_throttle(self, method):
+        with self._lock:
+            self._stats[method]["throttled"] += 1
+
+    def stats(self):
+        """Return per-method call counts, error counts and latencies."""
+        with self._lock:
+            return {
+                method: {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "throttled": entry["throttled"],
+                    "avg_ms": round(entry["total_seconds"] / entry["calls"] * 1000, 1),
+                    "max_ms": round(entry["max_seconds"] * 1000, 1),
+                }
+                for method, entry in self._stats.items()
+            }
@@ -0,0 +1,183 @@
+"""
+Lightweight request tracing - per-update span trees, slow log and slowest-trace buffer
+"""
+import contextvars
+import heapq
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from .config import TRACE_SLOW_SECONDS, TRACE_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('bot.tracing.slow')
+
+# (trace, current span) of the running code; copied into job queue workers
+_current = contextvars.ContextVar('trace_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'start', 'end', 'attrs', 'children', 'error')
+
+    def __init__(self, name, attrs=None, start=None):
+        self.name = name
+        self.start = time.monotonic() if start is None else start
+        self.end = None
+        self.attrs = attrs or {}
+        self.children = []
+        self.error = None
+
+    def to_dict(self, origin):
+        end = self.end if self.end is not None else time.monotonic()
+        node = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round((end - self.start) * 1000, 1),
+        }
+        if self.attrs:
+            node["attrs"] = self.attrs
+        if self.error:
+            node["error"] = self.error
+        if self.children:
+            node["children"] = [child.to_dict(origin) for child in self.children]
+        return node
+
+    def lines(self, origin, depth=0):
+        end = self.end if self.end is not None else time.monotonic()
+        attrs = ' '.join(f"{key}={value}" for key, value in self.attrs.items())
+        error = f" ERROR={self.error}" if self.error else ''
+        yield (f"{'  ' * depth}+{(self.start - origin) * 1000:8.1f}ms {(end - self.start) * 1000:8.1f}ms "
+               f"{self.name} {attrs}{error}").rstrip()
+        for child in self.children:
+            yield from child.lines(origin, depth + 1)
+
+
+class Trace:
+    """
+    One update's span tree. The trace completes when its root span has
+    ended and all background work that retained it (e.g. a queued TTS job)
+    has released it.
+    """
+
+    def __init__(self, name, attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.root = Span(name, attrs)
+        self.started_at = time.time()
+        self.duration = None
+        self._lock = threading.Lock()
+        self._pending = 1  # the root span itself
+
+    def add(self, parent, span):
+        with self._lock:
+            parent.children.append(span)
+
+    def retain(self):
+        with self._lock:
+            self._pending += 1
+
+    def release(self):
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            self.duration = time.monotonic() - self.root.start
+            _finished(self)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "trace_id": self.id,
+                "started_at": self.started_at,
+                "duration_ms": round((self.duration or 0) * 1000, 1),
+                "root": self.root.to_dict(self.root.start),
+            }
+
+    def format(self):
+        with self._lock:
+            return '\n'.join(self.root.lines(self.root.start))
+
+
+_lock = threading.Lock()
+_recent = deque(maxlen=TRACE_BUFFER_SIZE)
+_stats = {"traces": 0, "slow": 0}
+
+
+def _finished(trace):
+    with _lock:
+        _recent.append(trace)
+        _stats["traces"] += 1
+        slow = trace.duration >= TRACE_SLOW_SECONDS
+        if slow:
+            _stats["slow"] += 1
+    if slow:
+        slow_logger.warning(
+            f"Slow trace {trace.id} ({trace.root.name}) took {trace.duration * 1000:.0f}ms:\n{trace.format()}"
+        )
+
+
+@contextmanager
+def start_trace(name, **attrs):
+    """Run the block as the root span of a new trace."""
+    trace = Trace(name, attrs)
+    token = _current.set((trace, trace.root))
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end = time.monotonic()
+        _current.reset(token)
+        trace.release()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record the block as a child of the current span; a no-op outside a trace."""
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+    trace, parent = current
+    child = Span(name, attrs)
+    trace.add(parent, child)
+    token = _current.set((trace, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end = time.monotonic()
+        _current.reset(token)
+
+
+def record_span(name, start, end, **attrs):
+    """Add an already finished span (monotonic start/end) under the current span."""
+    current = _current.get()
+    if current is None:
+        return
+    trace, parent = current
+    child = Span(name, attrs, start=start)
+    child.end = end
+    trace.add(parent, child)
+
+
+def current_trace():
+    current = _current.get()
+    return current[0] if current else None
+
+
+def slowest(n=10):
+    """The n slowest of the recently completed traces, slowest first."""
+    with _lock:
+        traces = list(_recent)
+    return [trace.to_dict() for trace in heapq.nlargest(n, traces, key=lambda trace: trace.duration)]
+
+
+def stats():
+    with _lock:
+        return {**_stats, "buffered": len(_recent), "slow_threshold_seconds": TRACE_SLOW_SECONDS}
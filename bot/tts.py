@@ -0,0 +1,189 @@
+"""
+TTS helpers - text chunking, in-memory Edge TTS synthesis and MP3 joining
+"""
+import queue
+import re
+
+import edge_tts
+
+# Sentence ends (Latin, CJK, Devanagari) followed by whitespace or end of text
+_SENTENCE_END = re.compile(r'(?<=[.!?…。！？।])\s+|(?<=[。！？])')
+# Clause separators used when a single sentence is still too long
+_CLAUSE_END = re.compile(r'(?<=[,;:，、；：])\s*')
+
+
+def _pack(pieces, max_chars):
+    """Greedily merge consecutive pieces into chunks of at most max_chars."""
+    chunks = []
+    current = ''
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        candidate = f"{current} {piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            if current:
+                chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_long(piece, max_chars):
+    """Split an over-long sentence on clause boundaries, then on whitespace."""
+    parts = []
+    for clause in _pack(_CLAUSE_END.split(piece), max_chars):
+        while len(clause) > max_chars:
+            cut = clause.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            parts.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            parts.append(clause)
+    return parts
+
+
+def split_text(text, max_chars):
+    """
+    Split text into chunks of at most max_chars, breaking on sentence
+    boundaries where possible and on clause boundaries otherwise.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    for paragraph in text.splitlines():
+        for sentence in _SENTENCE_END.split(paragraph):
+            if len(sentence) > max_chars:
+                pieces.extend(_split_long(sentence, max_chars))
+            else:
+                pieces.append(sentence)
+    return _pack(pieces, max_chars)
+
+
+# Layer III bitrates in kbit/s by bitrate index, for MPEG-1 and for MPEG-2/2.5
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates in Hz by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _xing_frame_length(data):
+    """Length of a leading Xing/Info header frame (which holds no audio), or 0."""
+    if len(data) < 4 or data[0] != 0xff or data[1] & 0xe0 != 0xe0:
+        return 0
+    version = data[1] >> 3 & 3
+    layer = data[1] >> 1 & 3
+    bitrate_index = data[2] >> 4
+    rate_index = data[2] >> 2 & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    mpeg1 = version == 3
+    mono = data[3] >> 6 == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    if data[4 + side_info:8 + side_info] not in (b'Xing', b'Info'):
+        return 0
+    bitrate = _BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    return (144 if mpeg1 else 72) * bitrate // _SAMPLE_RATES[version][rate_index] + (data[2] >> 1 & 1)
+
+
+def strip_mp3_tags(data):
+    """
+    Remove a leading ID3v2 tag, a Xing/Info header frame and a trailing
+    ID3v1 tag, leaving raw MPEG audio frames.
+    """
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] & 0x7f) << 21 | (data[7] & 0x7f) << 14 | (data[8] & 0x7f) << 7 | (data[9] & 0x7f)
+        header = 10 + size + (10 if data[5] & 0x10 else 0)
+        data = data[header:]
+    data = data[_xing_frame_length(data):]
+    if len(data) >= 128 and data[-128:-125] == b'TAG':
+        data = data[:-128]
+    return data
+
+
+def join_mp3_frames(parts):
+    """
+    Concatenate MP3 streams frame-wise without re-encoding.
+
+    Edge TTS emits constant-bitrate MPEG frames with identical parameters
+    for every request, so the frames of consecutive chunks can simply be
+    appended once container tags and per-file header frames are removed.
+    """
+    return b''.join(strip_mp3_tags(part) for part in parts)
+
+
+async def synthesize_bytes(text, voice, timeout=30, connector=None):
+    """Synthesize text with Edge TTS and return the MP3 bytes (raises on failure)."""
+    communicate = edge_tts.Communicate(
+        text,
+        voice,
+        connect_timeout=timeout,
+        receive_timeout=timeout * 2,
+        connector=connector
+    )
+    audio = bytearray()
+    async for chunk in communicate.stream():
+        if chunk['type'] == 'audio':
+            audio.extend(chunk['data'])
+    return bytes(audio)
+
+
+_STREAM_DONE = object()
+
+
+def iter_audio_sync(text, voice, runtime, guard=None, timeout=30, first_chunk_timeout=None):
+    """
+    Yield MP3 bytes from Edge TTS to synchronous code as they are received.
+
+    Synthesis runs as a task on the shared AsyncRuntime loop, through the
+    EdgeGuard if one is given; closing the generator (e.g. when the HTTP
+    client disconnects) cancels the task. Errors are raised from the generator,
+    including TimeoutError when the first chunk takes longer than
+    first_chunk_timeout (default: timeout) or a later one longer than the
+    receive timeout.
+    """
+    chunks = queue.Queue()
+
+    async def pump():
+        communicate = edge_tts.Communicate(
+            text,
+            voice,
+            connect_timeout=timeout,
+            receive_timeout=timeout * 2,
+            connector=runtime.connector()
+        )
+        async for chunk in communicate.stream():
+            if chunk['type'] == 'audio':
+                chunks.put_nowait(chunk['data'])
+
+    async def produce():
+        try:
+            await (guard.call(pump) if guard else pump())
+            chunks.put_nowait(_STREAM_DONE)
+        except Exception as e:
+            chunks.put_nowait(e)
+
+    task = runtime.submit(produce())
+    wait = timeout if first_chunk_timeout is None else first_chunk_timeout
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=wait)
+            except queue.Empty:
+                raise TimeoutError(f"No audio from Edge TTS within {wait:.0f}s") from None
+            wait = timeout * 2
+            if item is _STREAM_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
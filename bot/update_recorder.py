@@ -0,0 +1,44 @@
+"""
+Webhook update recorder - appends raw Telegram updates to a JSON lines log
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateRecorder:
+    """
+    Appends every webhook update as {"ts": <unix time>, "update": {...}}
+    to a JSON lines file, for replay with bench/replay.py.
+
+    Each record is written with a single O_APPEND write so lines from
+    several worker processes do not interleave.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._fd = None
+        self.recorded = 0
+
+    def record(self, update):
+        line = json.dumps({"ts": time.time(), "update": update}, separators=(',', ':'), ensure_ascii=False)
+        data = (line + '\n').encode('utf-8')
+        try:
+            with self._lock:
+                if self._fd is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                    logger.info(f"Recording webhook updates to {self.path}")
+                os.write(self._fd, data)
+                self.recorded += 1
+        except OSError as e:
+            logger.error(f"Error recording update: {e}")
+
+    def stats(self):
+        return {"path": str(self.path), "recorded": self.recorded}
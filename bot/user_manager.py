@@ -4,10 +4,13 @@ User management utilities - tracking and broadcasting
 import json
 import logging
 import os
+import threading
 from pathlib import Path
-from typing import List, Set
+from typing import List
 
+from .append_log import AppendLog
 from .config import OWNER_ID
+from .metrics import FILE_IO_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -17,66 +20,112 @@ if os.environ.get('DYNO'):  # Heroku detection
 else:
     USER_DB_PATH = Path('userid.json')
 
+# Fold the journal into the JSON snapshot once it has this many entries
+COMPACT_THRESHOLD = 1000
 
-def load_users() -> Set[int]:
-    """Load user IDs from JSON file."""
-    try:
-        if USER_DB_PATH.exists():
-            with open(USER_DB_PATH, 'r') as f:
-                users = json.load(f)
-                return set(users)
-        else:
-            logger.warning(f"{USER_DB_PATH} not found, creating new file")
-            return set()
-    except Exception as e:
-        logger.error(f"Error loading users: {e}")
-        return set()
-
-
-def save_users(users: Set[int]) -> bool:
-    """Save user IDs to JSON file."""
-    try:
-        users_list = sorted(list(users))
-        with open(USER_DB_PATH, 'w') as f:
-            json.dump(users_list, f, indent=4)
-        logger.info(f"Saved {len(users_list)} users to {USER_DB_PATH}")
-        return True
-    except Exception as e:
-        logger.error(f"Error saving users: {e}")
-        return False
+
+class UserStore:
+    """
+    Set of registered user IDs with incremental, multi-process-safe persistence.
+
+    State is a JSON snapshot (a sorted list, the /getuserlist format) plus
+    an append-only journal with one user ID per line, both managed by an
+    AppendLog. Registering a user appends a single line; the journal is
+    folded into the snapshot by compact().
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._users = set()
+        self._log = AppendLog(
+            self.path,
+            self.path.with_name(self.path.name + '.log'),
+            self.path.with_name(self.path.name + '.lock'),
+            load=self._load_snapshot,
+            apply=lambda line: self._users.add(int(line))
+        )
+
+    def _load_snapshot(self, data):
+        self._users = set()
+        if data is None:
+            logger.warning(f"{self.path} not found, starting with an empty user list")
+            return
+        try:
+            self._users = set(json.loads(data))
+        except Exception as e:
+            logger.error(f"Error loading users: {e}")
+
+    def add(self, user_id: int) -> bool:
+        """Add a user. Returns True if the user was not registered before."""
+        with self._lock:
+            self._log.refresh()
+            if user_id in self._users:
+                return False
+            with self._log.lock():
+                self._log.refresh()
+                if user_id in self._users:
+                    return False
+                with FILE_IO_SECONDS.time('user_journal_append'):
+                    self._log.append(str(user_id).encode(), fsync=True)
+                if self._log.entries >= COMPACT_THRESHOLD:
+                    self.compact()
+            return True
+
+    def compact(self) -> Path:
+        """Fold the journal into the JSON snapshot atomically and return its path."""
+        with self._lock, self._log.lock():
+            self._log.refresh()
+            if self._log.entries or not self.path.exists():
+                self._log.compact(json.dumps(sorted(self._users), indent=4).encode())
+                logger.info(f"Compacted {len(self._users)} users into {self.path}")
+            return self.path
+
+    def all(self) -> List[int]:
+        with self._lock:
+            self._log.refresh()
+            return sorted(self._users)
+
+    def count(self) -> int:
+        with self._lock:
+            self._log.refresh()
+            return len(self._users)
+
+    def export_json(self) -> bytes:
+        """Serialize the user list in the userid.json format without touching disk."""
+        return json.dumps(self.all(), indent=4).encode()
+
+
+user_store = UserStore(USER_DB_PATH)
 
 
 def register_user(user_id: int) -> bool:
     """
-    Register a new user and notify owner if new.
+    Register a new user.
     Returns True if user is new, False if already exists.
     """
-    users = load_users()
-    
-    if user_id in users:
+    if not user_store.add(user_id):
         return False  # User already exists
-    
-    # Add new user
-    users.add(user_id)
-    save_users(users)
-    
-    logger.info(f"New user {user_id} registered. Total users: {len(users)}")
+
+    logger.info(f"New user {user_id} registered. Total users: {user_store.count()}")
     return True
 
 
 def get_all_users() -> List[int]:
     """Get list of all registered users."""
-    users = load_users()
-    return sorted(list(users))
+    return user_store.all()
 
 
 def get_user_count() -> int:
     """Get total number of registered users."""
-    users = load_users()
-    return len(users)
+    return user_store.count()
+
+
+def export_user_db() -> Path:
+    """Compact the user database and return the path of the JSON snapshot."""
+    return user_store.compact()
 
 
 def is_owner(user_id: int) -> bool:
     """Check if user is the bot owner."""
     return user_id == OWNER_ID
-
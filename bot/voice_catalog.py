@@ -0,0 +1,175 @@
+"""
+Indexed voice catalog - voice.json parsed once, lookups by dictionary
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from functools import cached_property
+from pathlib import Path
+
+from .config import VOICE_JSON_PATH, VOICE_CATALOG_CHECK_INTERVAL
+from .utils import locale_names
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceCatalog:
+    """
+    Immutable country -> language -> voices index over one voice.json snapshot.
+
+    Country and language names follow the bot menus (pycountry names);
+    voices with malformed locales are left out of the menus but can still
+    be looked up by ShortName. web_tree keeps the grouping used by the web
+    interface, which prefers the CountryName/LanguageName fields.
+    """
+
+    def __init__(self, voices, version):
+        self.voices = voices
+        self.version = version
+
+        self._by_short_name = {}
+        self._voice_ids = {}  # ShortName -> index in voices
+        languages = {}   # country -> set of languages
+        grouped = {}     # (country, language) -> [voices]
+        self.web_tree = {}
+
+        for index, voice in enumerate(voices):
+            short_name = voice.get('ShortName')
+            if short_name:
+                self._by_short_name[short_name] = voice
+                self._voice_ids[short_name] = index
+
+            names = locale_names(voice.get('Locale', ''))
+            if names:
+                country_name, language_name = names
+                languages.setdefault(country_name, set()).add(language_name)
+                grouped.setdefault((country_name, language_name), []).append(voice)
+
+            if 'CountryName' in voice and 'LanguageName' in voice:
+                web_country, web_language = voice['CountryName'], voice['LanguageName']
+            elif names:
+                web_country, web_language = names
+            else:
+                web_country, web_language = 'Unknown', 'Unknown'
+            self.web_tree.setdefault(web_country, {}).setdefault(web_language, []).append(voice)
+
+        self.countries = sorted(languages)
+        self._country_ids = {name: i for i, name in enumerate(self.countries)}
+        self._languages = {country: sorted(names) for country, names in languages.items()}
+        self._voices = grouped
+
+    @classmethod
+    def from_file(cls, path):
+        """Build a catalog from a voice.json file."""
+        raw = Path(path).read_bytes()
+        voices = json.loads(raw)
+        version = hashlib.sha1(raw).hexdigest()[:8]
+        logger.info(f"Voice catalog {version} built: {len(voices)} voices")
+        return cls(voices, version)
+
+    @cached_property
+    def web_json(self):
+        """web_tree as compact UTF-8 JSON, trimmed to the fields the web interface uses."""
+        tree = {
+            country: {
+                language: [{key: voice.get(key) for key in ('ShortName', 'Name', 'Gender')} for voice in voices]
+                for language, voices in languages.items()
+            }
+            for country, languages in self.web_tree.items()
+        }
+        return json.dumps(tree, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def get_countries(self):
+        """Sorted list of country names."""
+        return self.countries
+
+    def get_languages(self, country_name):
+        """Sorted list of language names available in a country."""
+        return self._languages.get(country_name, [])
+
+    def get_voices(self, country_name, language_name):
+        """Voices for a country and language, in voice.json order."""
+        return self._voices.get((country_name, language_name), [])
+
+    def get_voice(self, short_name):
+        """Voice entry by ShortName, or None."""
+        return self._by_short_name.get(short_name)
+
+    def voice_id(self, short_name):
+        """Index of a voice in voices, or None."""
+        return self._voice_ids.get(short_name)
+
+    def voice_by_id(self, voice_id):
+        """Voice entry for an index from voice_id(), or None."""
+        if voice_id is None or not 0 <= voice_id < len(self.voices):
+            return None
+        return self.voices[voice_id]
+
+    def country_id(self, country_name):
+        """Index of a country in get_countries(), or None."""
+        return self._country_ids.get(country_name)
+
+    def country_name(self, country_id):
+        """Country name for an index from country_id(), or None."""
+        if country_id is None or not 0 <= country_id < len(self.countries):
+            return None
+        return self.countries[country_id]
+
+    def language_id(self, country_name, language_name):
+        """Index of a language within get_languages(country_name), or None."""
+        try:
+            return self.get_languages(country_name).index(language_name)
+        except ValueError:
+            return None
+
+    def language_name(self, country_name, language_id):
+        """Language name for an index from language_id(), or None."""
+        languages = self.get_languages(country_name)
+        if language_id is None or not 0 <= language_id < len(languages):
+            return None
+        return languages[language_id]
+
+
+_EMPTY_CATALOG = VoiceCatalog([], 'empty')
+
+_lock = threading.Lock()
+_catalog = None
+_catalog_stamp = None
+_last_check = 0.0
+
+
+def get_catalog(path=None):
+    """
+    Return the current catalog, building it on first use.
+
+    voice.json is stat()ed at most every VOICE_CATALOG_CHECK_INTERVAL
+    seconds and the catalog is rebuilt when its size or mtime changes.
+    """
+    global _catalog, _catalog_stamp, _last_check
+    path = Path(path or VOICE_JSON_PATH)
+
+    now = time.monotonic()
+    if _catalog is not None and now - _last_check < VOICE_CATALOG_CHECK_INTERVAL:
+        return _catalog
+
+    with _lock:
+        if _catalog is not None and now - _last_check < VOICE_CATALOG_CHECK_INTERVAL:
+            return _catalog
+        _last_check = now
+        try:
+            st = path.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            logger.error(f"Voice list {path} unavailable: {e}")
+            return _catalog or _EMPTY_CATALOG
+
+        if stamp != _catalog_stamp:
+            try:
+                _catalog = VoiceCatalog.from_file(path)
+                _catalog_stamp = stamp
+            except Exception as e:
+                logger.error(f"Error building voice catalog: {e}")
+                return _catalog or _EMPTY_CATALOG
+        return _catalog
@@ -0,0 +1,40 @@
+"""
+Web assets - precompressed, content-hashed payloads served with ETags
+"""
+import gzip
+import hashlib
+
+from flask import Response, request
+
+# Cache-Control for URLs that embed the content hash and therefore never change
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+
+class WebAsset:
+    """
+    An in-memory response body with a content-hash version and a gzip copy
+    made once, so serving it costs no serialization or compression.
+    """
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        self.version = hashlib.sha256(data).hexdigest()[:12]
+        self.gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+
+    def response(self, cache_control):
+        """Build a response for the current request: 304, gzip or identity."""
+        # Each encoding is its own representation and gets its own strong ETag
+        gzip_ok = 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+        etag = f"{self.version}-gz" if gzip_ok else self.version
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif gzip_ok:
+            response = Response(self.gzipped, mimetype=self.mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(self.data, mimetype=self.mimetype)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
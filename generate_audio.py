@@ -49,8 +49,7 @@ def generate_audio():
     success = generate_tts_with_retry(
         text=text,
         voice=voice,
-        output_path=output_path,
-        max_retries=3
+        output_path=output_path
     )
     
     print()
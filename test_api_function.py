@@ -54,13 +54,10 @@ def test_tts_api_function():
         
         print("  🔄 Generating audio...")
         
-        # Test with fast_mode=False (normal mode for API)
         success = generate_tts_with_retry(
             text=test_case['text'],
             voice=test_case['voice'],
-            output_path=output_path,
-            max_retries=5,
-            fast_mode=False
+            output_path=output_path
         )
         
         if success:
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test the audio reaper together with the audio cache
+"""
+import sys
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.audio_cache import AudioCache, cache_key
+from bot.audio_reaper import AudioReaper
+
+EXPIRY = 100
+AUDIO = b'\xff\xfb' * 500
+
+
+def make_cache(cache_dir):
+    reaper = AudioReaper(cache_dir, EXPIRY, 10 * 1024 * 1024, interval=3600)
+    cache = AudioCache(cache_dir, 1024 * 1024, 1024 * 1024, reaper=reaper)
+    reaper.on_delete = lambda path: cache.forget(path.stem)
+    return cache, reaper
+
+
+def test_memory_hits_keep_file_alive():
+    """A file served from the memory tier must not expire while it is in use."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, reaper = make_cache(Path(tmp))
+        key = cache_key('en-US-AriaNeural', 'Hello there.')
+        path = cache.put(key, AUDIO)
+
+        # Written long ago, but still being hit from memory
+        old = time.time() - 2 * EXPIRY
+        os.utime(path, (old, old))
+        reaper.track(path, len(AUDIO), mtime=old)
+        assert cache.get(key) == AUDIO
+
+        reaper.reap()
+        assert path.exists(), "memory hit did not postpone expiry"
+
+
+def test_deleted_file_restored_from_memory():
+    """A memory hit whose file another worker deleted must be written back."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, _ = make_cache(Path(tmp))
+        key = cache_key('en-US-AriaNeural', 'Hello again.')
+        path = cache.put(key, AUDIO)
+
+        path.unlink()  # e.g. another worker process's reaper
+        assert cache.ensure_file(key) == path
+        assert path.read_bytes() == AUDIO
+        assert cache.ensure_file(cache_key('en-US-AriaNeural', 'Never synthesized.')) is None
+
+
+def test_files_outside_root_are_kept():
+    """Audio outside the reaper's directory (e.g. tracked in git) is never deleted."""
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        sibling = base / 'web' / 'sample.mp3'
+        sibling.parent.mkdir()
+        sibling.write_bytes(AUDIO)
+        old = time.time() - 2 * EXPIRY
+        os.utime(sibling, (old, old))
+
+        cache, reaper = make_cache(base / 'cache')
+        reaper._scan()
+        reaper.reap(now=time.time() + 2 * EXPIRY)
+        assert sibling.exists()
+
+
+def test_evicted_file_kept_when_put_again():
+    """A file queued for deletion by eviction must survive being cached again."""
+    with tempfile.TemporaryDirectory() as tmp:
+        reaper = AudioReaper(Path(tmp), EXPIRY, 10 * 1024 * 1024, interval=3600)
+        cache = AudioCache(Path(tmp), 1024 * 1024, len(AUDIO) * 3 // 2, reaper=reaper)
+        reaper.on_delete = lambda path: cache.forget(path.stem)
+        first = cache_key('en-US-AriaNeural', 'First.')
+        second = cache_key('en-US-AriaNeural', 'Second.')
+        path = cache.put(first, AUDIO)
+        cache.put(second, AUDIO)  # evicts first
+        cache.put(first, AUDIO)  # evicts second, first is live again
+
+        reaper.reap()
+        assert path.exists(), "re-cached file was deleted"
+        assert cache.ensure_file(first) == path
+        assert not cache.path(second).exists()
+
+
+def test_evicted_file_kept_when_touched():
+    """A file queued for deletion but used since (e.g. by another worker) is kept."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, reaper = make_cache(Path(tmp))
+        key = cache_key('en-US-AriaNeural', 'Touched.')
+        path = cache.put(key, AUDIO)
+        old = time.time() - EXPIRY / 2
+        os.utime(path, (old, old))
+
+        reaper.delete_later(path)
+        time.sleep(0.05)
+        os.utime(path)
+        reaper.reap()
+        assert path.exists()
+
+
+if __name__ == "__main__":
+    for test in (test_memory_hits_keep_file_alive, test_deleted_file_restored_from_memory, test_files_outside_root_are_kept,
+                 test_evicted_file_kept_when_put_again, test_evicted_file_kept_when_touched):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test inline keyboard callback_data encoding and decoding of client input
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot import callback_data
+from bot.callback_data import encode, decode, ARITY, MAX_CALLBACK_DATA
+
+VERSION = '1a2b3c4d'
+
+
+def test_round_trip_every_kind():
+    for kind, arity in ARITY.items():
+        ids = tuple(range(7, 7 + arity))
+        data = encode(VERSION, kind, *ids)
+        assert decode(data) == (VERSION, kind, ids), data
+
+
+def test_encode_format():
+    assert encode(VERSION, callback_data.LANGUAGE, 12, 3) == '1a2b3c4d|l:12:3'
+    assert encode(VERSION, callback_data.BACK_TO_COUNTRIES) == '1a2b3c4d|bc'
+
+
+def test_encode_rejects_oversized_payload():
+    try:
+        encode('v' * MAX_CALLBACK_DATA, callback_data.COUNTRY, 1)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_old_format_payloads():
+    # Buttons from before versioned callback_data
+    for data in ('country_United States', 'lang_English', 'voice_en-US-AriaNeural', 'back_to_countries', 'page_2'):
+        assert decode(data) is None, data
+
+
+def test_malformed_payloads():
+    for data in ('', '|', f'{VERSION}|', f'{VERSION}|zz:1', f'{VERSION}|c', f'{VERSION}|c:1:2',
+                 f'{VERSION}|bc:1', f'{VERSION}|l:1', f'{VERSION}|c:', f'{VERSION}|c:x',
+                 f'{VERSION}|c:-1', f'{VERSION}|c:+1', f'{VERSION}|c: 1', f'{VERSION}|c:1_0',
+                 f'{VERSION}|c:١', f'{VERSION}|c:²', f'{VERSION}|vp:1:2:3:4'):
+        assert decode(data) is None, data
+
+
+def test_stale_version_still_decodes():
+    # The version is compared with the live catalog by the caller
+    assert decode('deadbeef|v:5') == ('deadbeef', callback_data.VOICE, (5,))
+
+
+def test_back_to_languages_with_unknown_country_shows_countries():
+    import app
+
+    shown = []
+    original = app.show_menu
+    app.show_menu = lambda callback_query, text, reply_markup=None: shown.append(text)
+    try:
+        catalog = app.get_catalog()
+        callback_query = {'id': '1', 'from': {'id': 42}, 'message': {'chat': {'id': 42}, 'message_id': 7}}
+        app.handle_back_to_languages(callback_query, catalog, len(catalog.get_countries()) + 5)
+    finally:
+        app.show_menu = original
+    assert shown == ["🌍 *Select Your Country:*"]
+    assert app.state_store.get(42)['state'] == 'selecting_country'
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Test the Edge TTS circuit breaker, AIMD concurrency limit and guard
+"""
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp.client_exceptions import WSServerHandshakeError
+
+from bot.edge_guard import CircuitBreaker, AimdLimiter, EdgeGuard, EdgeUnavailableError, is_throttle_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def handshake_error(status):
+    request_info = SimpleNamespace(real_url='wss://speech.platform.bing.com/')
+    return WSServerHandshakeError(request_info, (), status=status, message='Invalid response status')
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_threshold():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=3, recovery_time=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == 'closed'
+    breaker.record_failure()
+    assert breaker.stats()["state"] == 'open'
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+    clock.advance(10)
+    assert breaker.retry_after() == 20
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker(threshold=3, clock=FakeClock())
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == 'closed'
+
+
+def test_half_open_allows_one_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, recovery_time=30, clock=clock)
+    open_breaker(breaker)
+    clock.advance(30)
+    assert breaker.stats()["state"] == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()  # probe in flight
+    breaker.record_neutral()
+    assert breaker.allow()  # neutral outcome frees the probe slot
+
+
+def test_probe_success_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, recovery_time=30, clock=clock)
+    open_breaker(breaker)
+    clock.advance(30)
+    assert breaker.allow()
+    breaker.record_success()
+    stats = breaker.stats()
+    assert stats["state"] == 'closed' and stats["consecutive_failures"] == 0 and stats["recovery_time"] == 30
+    assert breaker.allow() and breaker.allow()
+    assert breaker.retry_after() == 0
+
+
+def test_probe_failure_reopens_with_doubled_recovery():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, recovery_time=30, max_recovery_time=100, clock=clock)
+    open_breaker(breaker)
+    for expected in (60, 100, 100):
+        clock.advance(breaker.retry_after())
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.stats()["state"] == 'open'
+        assert breaker.retry_after() == expected
+    assert breaker.stats()["times_opened"] == 4
+
+
+def test_aimd_additive_increase_up_to_maximum():
+    limiter = AimdLimiter(initial=2, maximum=4, clock=FakeClock())
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.limit == 2  # 2 + 1/2 + 1/2.5
+    limiter.on_success()
+    assert limiter.limit == 3
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.limit == 4
+
+
+def test_aimd_multiplicative_decrease_with_cooldown():
+    clock = FakeClock()
+    limiter = AimdLimiter(initial=16, minimum=2, maximum=16, decrease_cooldown=2.0, clock=clock)
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    limiter.on_throttle()  # same burst
+    assert limiter.limit == 8
+    for expected in (4, 2, 2):
+        clock.advance(2.0)
+        limiter.on_throttle()
+        assert limiter.limit == expected
+
+
+def test_aimd_limits_concurrency():
+    async def run():
+        limiter = AimdLimiter(initial=2, clock=FakeClock())
+        running = []
+        peak = []
+
+        async def job():
+            await limiter.acquire()
+            try:
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+            finally:
+                limiter.release()
+
+        await asyncio.gather(*(job() for _ in range(6)))
+        return max(peak), limiter.stats()
+
+    peak, stats = asyncio.run(run())
+    assert peak == 2
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
+
+
+def test_aimd_cancelled_waiter_releases_nothing():
+    async def run():
+        limiter = AimdLimiter(initial=1, clock=FakeClock())
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+        return limiter.stats()
+
+    assert asyncio.run(run()) == {"limit": 1, "in_flight": 0, "waiting": 0}
+
+
+def test_guard_counts_only_throttle_errors():
+    clock = FakeClock()
+    guard = EdgeGuard(CircuitBreaker(threshold=2, clock=clock), AimdLimiter(initial=8, clock=clock))
+
+    async def fail(error):
+        raise error
+
+    async def call(error):
+        try:
+            await guard.call(lambda: fail(error))
+        except Exception as e:
+            return e
+
+    no_audio = Exception("No audio was received. Text length: 403")
+    asyncio.run(call(no_audio))
+    asyncio.run(call(no_audio))
+    assert guard.breaker.stats()["state"] == 'closed' and guard.limiter.limit == 8
+
+    asyncio.run(call(handshake_error(403)))
+    assert guard.limiter.limit == 4
+    clock.advance(5)
+    asyncio.run(call(handshake_error(403)))
+    assert guard.is_open()
+    assert isinstance(asyncio.run(call(no_audio)), EdgeUnavailableError)
+
+
+def test_is_throttle_error():
+    assert is_throttle_error(handshake_error(403))
+    assert not is_throttle_error(handshake_error(500))
+    assert not is_throttle_error(Exception("No audio was received. Text length: 1403"))
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
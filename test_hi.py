@@ -49,8 +49,7 @@ def test_hi():
     success = generate_tts_with_retry(
         text=text,
         voice=voice,
-        output_path=output_path,
-        max_retries=5  # Using improved retry logic with 5 attempts
+        output_path=output_path
     )
     
     print()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test Edge TTS error classification and the retry policy's budgets and deadline
+"""
+import sys
+import os
+import asyncio
+import concurrent.futures
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp.client_exceptions import WSServerHandshakeError
+
+from bot.edge_guard import EdgeUnavailableError, EDGE_403_PREFIX, classify_error
+from bot.retry_policy import RetryPolicy, DEFAULT_BUDGETS, BASE_DELAYS
+
+
+def handshake_error(status):
+    request_info = SimpleNamespace(real_url='wss://speech.platform.bing.com/')
+    return WSServerHandshakeError(request_info, (), status=status, message='Invalid response status')
+
+
+def elapse(policy, seconds):
+    """Pretend the policy started `seconds` earlier."""
+    policy.started -= seconds
+
+
+def test_classify_error():
+    cases = [
+        (EdgeUnavailableError(10), 'unavailable'),
+        (asyncio.TimeoutError(), 'timeout'),
+        (concurrent.futures.TimeoutError(), 'timeout'),
+        (TimeoutError("No audio from Edge TTS within 5s"), 'timeout'),
+        (Exception("TTS generation timed out after 5s. Please try again."), 'timeout'),
+        (handshake_error(403), '403'),
+        (Exception(f"{EDGE_403_PREFIX}: 403, message='Invalid response status'"), '403'),
+        (Exception("No audio was received. Please verify that your parameters are correct."), 'no_audio'),
+        (Exception("Invalid voice parameter: xx. Please select a valid voice."), 'invalid'),
+        (handshake_error(500), 'other'),
+        (Exception("Connection reset by peer"), 'other'),
+    ]
+    for error, expected in cases:
+        assert classify_error(error) == expected, (error, expected)
+
+
+def test_text_length_containing_403_is_not_a_403():
+    for length in (403, 1403, 4030):
+        error = Exception(f"No audio was received. Please verify that your parameters are correct. "
+                          f"Voice: en-US-AriaNeural, Text length: {length}")
+        assert classify_error(error) == 'no_audio'
+    assert classify_error(Exception("Unexpected reply for request 1403")) == 'other'
+
+
+def test_budget_exhaustion_per_class():
+    errors = {
+        '403': handshake_error(403),
+        'no_audio': Exception("No audio was received."),
+        'timeout': asyncio.TimeoutError(),
+        'other': Exception("Connection reset by peer"),
+    }
+    for error_class, error in errors.items():
+        policy = RetryPolicy(600)
+        for _ in range(DEFAULT_BUDGETS[error_class]):
+            assert policy.attempt_timeout() is not None
+            assert policy.record_failure(error) is not None
+        assert policy.give_up_reason is None
+        policy.attempt_timeout()
+        assert policy.record_failure(error) is None
+        assert policy.give_up_reason == f"{error_class}_budget"
+        assert policy.failures == {error_class: DEFAULT_BUDGETS[error_class] + 1}
+
+
+def test_budgets_are_per_class():
+    policy = RetryPolicy(600)
+    for error in (handshake_error(403), asyncio.TimeoutError(), handshake_error(403), asyncio.TimeoutError()):
+        policy.attempt_timeout()
+        assert policy.record_failure(error) is not None
+    assert policy.failures == {'403': 2, 'timeout': 2}
+
+
+def test_no_retry_for_invalid_or_unavailable():
+    for error, reason in ((Exception("Invalid voice parameter: x"), 'invalid'), (EdgeUnavailableError(30), 'unavailable')):
+        policy = RetryPolicy(600)
+        policy.attempt_timeout()
+        assert policy.record_failure(error) is None
+        assert policy.give_up_reason == reason
+
+
+def test_budget_override():
+    policy = RetryPolicy(600, budgets={'403': 0})
+    policy.attempt_timeout()
+    assert policy.record_failure(handshake_error(403)) is None
+    assert policy.give_up_reason == '403_budget'
+
+
+def test_backoff_bounds():
+    for error_class, error in (('403', handshake_error(403)), ('timeout', asyncio.TimeoutError())):
+        policy = RetryPolicy(600, budgets={error_class: 10})
+        base = BASE_DELAYS[error_class]
+        for count in range(1, 8):
+            delay = policy.record_failure(error)
+            assert base <= delay <= min(base * 2 ** count, policy.max_delay), (error_class, count, delay)
+
+
+def test_attempt_timeout_is_whole_seconds_and_capped():
+    policy = RetryPolicy(60, max_attempt_time=15)
+    assert policy.attempt_timeout() == 15
+    elapse(policy, 50.5)
+    timeout = policy.attempt_timeout()
+    assert isinstance(timeout, int) and timeout == 9
+    assert policy.attempts == 2
+
+
+def test_first_attempt_always_runs():
+    policy = RetryPolicy(0.5)
+    assert policy.attempt_timeout() == 1
+    assert policy.attempt_timeout() is None
+    assert policy.give_up_reason == 'deadline'
+
+
+def test_deadline_stops_attempts():
+    policy = RetryPolicy(20, min_attempt_time=3)
+    policy.attempt_timeout()
+    elapse(policy, 17.5)
+    assert policy.attempt_timeout() is None
+    assert policy.give_up_reason == 'deadline'
+
+
+def test_no_retry_when_backoff_would_pass_the_deadline():
+    policy = RetryPolicy(20, min_attempt_time=3)
+    policy.attempt_timeout()
+    elapse(policy, 16.9)  # 3.1s left: any 403 backoff (>= 1s) leaves less than min_attempt_time
+    assert policy.record_failure(handshake_error(403)) is None
+    assert policy.give_up_reason == 'deadline'
+
+
+def test_summary():
+    policy = RetryPolicy(30)
+    policy.attempt_timeout()
+    policy.record_failure(asyncio.TimeoutError())
+    summary = policy.summary()
+    assert 'attempts=1' in summary and 'timeout=1' in summary and 'gave up: no' in summary
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
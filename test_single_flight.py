@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Test single-flight calls and shared streams under concurrency
+"""
+import sys
+import os
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.single_flight import SingleFlight, SharedStream
+
+WAITERS = 8
+
+
+def run_threads(target, count):
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_waiters(flights, count):
+    deadline = time.monotonic() + 5
+    while flights.stats()["waiting"] < count:
+        assert time.monotonic() < deadline, flights.stats()
+        time.sleep(0.001)
+
+
+def test_one_leader_many_waiters():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def synthesize():
+        calls.append(1)
+        release.wait(5)
+        return 'audio'
+
+    threads, results = run_threads(lambda: flights.do('key', synthesize, timeout=5), WAITERS + 1)
+    wait_for_waiters(flights, WAITERS)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [('audio', False)] + [('audio', True)] * WAITERS
+    stats = flights.stats()
+    assert stats["in_flight"] == 0 and stats["leaders"] == 1 and stats["followers"] == WAITERS
+
+
+def test_leader_failure_reaches_waiters():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def synthesize():
+        release.wait(5)
+        raise ValueError("Edge refused")
+
+    threads, results = run_threads(lambda: flights.do('key', synthesize, timeout=5), WAITERS + 1)
+    wait_for_waiters(flights, WAITERS)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(r, ValueError) and str(r) == "Edge refused" for r in results)
+
+
+def test_waiter_timeout_and_key_forgotten():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=('key', lambda: release.wait(5)))
+    leader.start()
+    while not flights.stats()["in_flight"]:
+        time.sleep(0.001)
+    try:
+        flights.do('key', lambda: 'unused', timeout=0.05)
+        assert False, "expected TimeoutError"
+    except TimeoutError:
+        pass
+    release.set()
+    leader.join()
+    assert flights.do('key', lambda: 'again') == ('again', False)
+
+
+def test_late_reader_gets_buffered_chunks():
+    stream = SharedStream()
+    stream.append(b'one')
+    stream.append(b'two')
+    early = stream.read(first_timeout=1, timeout=1)
+    assert next(early) == b'one'
+
+    late_chunks = []
+    late = threading.Thread(target=lambda: late_chunks.extend(stream.read(first_timeout=5, timeout=5)))
+    late.start()
+    stream.append(b'three')
+    stream.finish()
+    late.join()
+    assert late_chunks == [b'one', b'two', b'three']
+    assert list(early) == [b'two', b'three']
+
+
+def test_stream_error_reaches_readers_after_chunks():
+    stream = SharedStream()
+    stream.append(b'one')
+    stream.finish(ConnectionError("Edge dropped"))
+    chunks = []
+    try:
+        for chunk in stream.read(first_timeout=1, timeout=1):
+            chunks.append(chunk)
+        assert False, "expected ConnectionError"
+    except ConnectionError:
+        pass
+    assert chunks == [b'one']
+
+
+def test_stream_read_timeout():
+    stream = SharedStream()
+    try:
+        next(stream.read(first_timeout=0.05))
+        assert False, "expected TimeoutError"
+    except TimeoutError:
+        pass
+    assert not stream.wait(0.01)
+
+
+def test_concurrent_streams_share_one_producer():
+    flights = SingleFlight()
+    producers = []
+
+    def start(stream):
+        producers.append(stream)
+
+    threads, results = run_threads(lambda: flights.stream('key', start, timeout=5), WAITERS)
+    for thread in threads:
+        thread.join()
+    assert len(producers) == 1
+    assert sum(1 for stream, shared in results if not shared) == 1
+    assert all(stream is producers[0] for stream, _ in results)
+
+    producers[0].append(b'audio')
+    flights.finish('key', producers[0])
+    assert [list(stream.read(1, 1)) for stream, _ in results] == [[b'audio']] * WAITERS
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_call_waits_for_live_stream():
+    flights = SingleFlight()
+    cache = {}
+    stream, _ = flights.stream('key', lambda stream: None)
+    threads, results = run_threads(lambda: flights.do('key', lambda: cache.get('key', 'synthesized'), timeout=5), 1)
+    wait_for_waiters(flights, 1)
+    cache['key'] = 'cached'
+    flights.finish('key', stream)
+    threads[0].join()
+    assert results == [('cached', False)]
+
+
+def test_stream_waits_for_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=('key', lambda: release.wait(5)))
+    leader.start()
+    while not flights.stats()["in_flight"]:
+        time.sleep(0.001)
+    started = []
+    threads, results = run_threads(lambda: flights.stream('key', started.append, timeout=5), 1)
+    wait_for_waiters(flights, 1)
+    assert not started
+    release.set()
+    leader.join()
+    threads[0].join()
+    stream, shared = results[0]
+    assert started == [stream] and not shared
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
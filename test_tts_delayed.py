@@ -52,8 +52,7 @@ def test_with_delay():
     success = generate_tts_with_retry(
         text=test_text,
         voice=test_voice,
-        output_path=output_path,
-        max_retries=3
+        output_path=output_path
     )
     
     print()
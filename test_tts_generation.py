@@ -49,8 +49,7 @@ def test_tts_generation():
     success = generate_tts_with_retry(
         text=test_text,
         voice=test_voice,
-        output_path=output_path,
-        max_retries=3
+        output_path=output_path
     )
     
     print()
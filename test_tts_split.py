@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test text chunking and MP3 joining for long TTS requests
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bot.tts import split_text, join_mp3_frames, strip_mp3_tags
+
+# One MPEG-2 Layer III frame as Edge TTS sends it: 48 kbit/s, 24 kHz, mono (144 bytes)
+FRAME_HEADER = b'\xff\xf3\x64\xc4'
+FRAME = FRAME_HEADER + b'\x00' * 140
+
+
+def assert_chunks(text, max_chars):
+    chunks = split_text(text, max_chars)
+    assert all(0 < len(chunk) <= max_chars for chunk in chunks), chunks
+    # Every non-space character survives, in order
+    assert ''.join(''.join(chunks).split()) == ''.join(text.split())
+    return chunks
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("  Hello there.  ", 100) == ["Hello there."]
+    assert split_text("   ", 100) == []
+
+
+def test_splits_on_sentences():
+    chunks = assert_chunks("First sentence here. Second one! Third? Fourth sentence ends.", 25)
+    assert chunks[0] == "First sentence here."
+    assert all(chunk[-1] in '.!?' for chunk in chunks)
+
+
+def test_packs_short_sentences_together():
+    assert assert_chunks("One. Two. Three. Four.", 10) == ["One. Two.", "Three.", "Four."]
+
+
+def test_cjk_and_devanagari_sentences():
+    assert_chunks("这是第一句。这是第二句！这是第三句？", 7)
+    assert_chunks("यह पहला वाक्य है। यह दूसरा वाक्य है।", 20)
+
+
+def test_long_sentence_splits_on_clauses():
+    chunks = assert_chunks("alpha beta gamma, delta epsilon zeta; eta theta iota: kappa lambda", 20)
+    assert chunks[0] == "alpha beta gamma,"
+
+
+def test_no_boundaries_splits_on_whitespace():
+    text = " ".join(f"word{i}" for i in range(50))
+    assert_chunks(text, 30)
+
+
+def test_over_long_word_is_cut():
+    chunks = assert_chunks("x" * 95 + " tail", 40)
+    assert chunks[:2] == ["x" * 40, "x" * 40]
+
+
+def test_paragraphs():
+    assert_chunks("Line one is here.\nLine two is here.\n\nLine three.", 20)
+
+
+def test_strip_id3v2_and_id3v1():
+    id3v2 = b'ID3\x04\x00\x00\x00\x00\x00\x0a' + b'\x00' * 10
+    id3v1 = b'TAG' + b'\x00' * 125
+    assert strip_mp3_tags(id3v2 + FRAME + id3v1) == FRAME
+
+
+def test_strip_id3v2_with_footer():
+    id3v2 = b'ID3\x04\x00\x10\x00\x00\x00\x05' + b'\x00' * 5 + b'3DI' + b'\x00' * 7
+    assert strip_mp3_tags(id3v2 + FRAME * 2) == FRAME * 2
+
+
+def test_strip_xing_header_frame():
+    # Mono MPEG-2 side info is 9 bytes, so the tag sits right after it
+    for tag in (b'Xing', b'Info'):
+        xing = (FRAME_HEADER + b'\x00' * 9 + tag).ljust(len(FRAME), b'\x00')
+        assert strip_mp3_tags(xing + FRAME * 3) == FRAME * 3
+
+
+def test_untagged_audio_is_unchanged():
+    assert strip_mp3_tags(FRAME * 3) == FRAME * 3
+    assert strip_mp3_tags(b'') == b''
+
+
+def test_join_frames():
+    id3v2 = b'ID3\x04\x00\x00\x00\x00\x00\x02' + b'\x00' * 2
+    parts = [id3v2 + FRAME * 2, FRAME, id3v2 + FRAME * 3]
+    assert join_mp3_frames(parts) == FRAME * 6
+    assert join_mp3_frames([FRAME]) == FRAME
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")